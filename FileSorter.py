@@ -7,12 +7,18 @@ FileSorter.py - Downloads Cleaner (only)
 - Sort root can be changed via folder picker (Explorer/Finder).
 
 No external libs. UI is ANSI + minimal key reader.
+
+Scheduled / login-hook runs: `python -m FileSorter --sort` (from this folder) starts
+from __pycache__; running the file directly recompiles it on every start.
+Startup regression check: `python FileSorterBench.py --startup 20 --max-ms 50`.
 """
 
-import os, sys, json, re, shutil, argparse, subprocess
+import os, sys, json, re, threading, time, errno, atexit
 from pathlib import Path
 from datetime import datetime
-from collections import defaultdict
+from collections import defaultdict, deque
+# Imported where used, to keep `--sort` startup short: argparse, subprocess, shutil, hashlib, mmap,
+# concurrent.futures (pulls in logging), tkinter, termios/msvcrt, ctypes, multiprocessing.
 
 
 # ----------------------------
@@ -32,6 +38,7 @@ SESSION = {
     "moves": [],
     "move_summary": [],
     "last_open_dir": None,
+    "progress": None,   # Progress of the sort running in the background
 }
 
 
@@ -58,11 +65,126 @@ def ensure_dirs(p: Path):
 def expand_path(p: str) -> Path:
     return Path(os.path.expandvars(os.path.expanduser(p))).resolve()
 
+class LogWriter:
+    """
+    One open handle + a bounded in-memory buffer.
+
+    - A background thread flushes every flush_s, or as soon as flush_lines are queued.
+    - A full buffer (max_lines) is flushed by the caller instead of dropping lines.
+    - Rotates at max_bytes (checked per flushed batch): FileSorter.log -> .1 -> .2 ..., keeping `backups`.
+    - Flushed at exit (atexit also runs after an uncaught exception). The entry points
+      (main) turn SIGTERM into SystemExit via exit_on_sigterm(), so a killed daemon exits
+      that way too; importers keep their own signal handling.
+    """
+
+    def __init__(self, path: Path, max_bytes=5 << 20, backups=3, flush_lines=256, flush_s=1.0, max_lines=10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_lines = flush_lines
+        self.flush_s = flush_s
+        self.max_lines = max_lines
+        self.buf = []
+        self.cond = threading.Condition()
+        self.io_lock = threading.Lock()
+        self.f = None
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="log-flush", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def write(self, line: str):
+        with self.cond:
+            self.buf.append(line)
+            n = len(self.buf)
+            if n >= self.flush_lines:
+                self.cond.notify()
+        if n >= self.max_lines or self.closed:
+            self.flush()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                if not self.buf and not self.closed:
+                    self.cond.wait(self.flush_s)
+                if self.closed:
+                    return
+            self.flush()
+
+    def _open(self):
+        ensure_dirs(self.path.parent)
+        self.f = open(self.path, "a", encoding="utf-8")
+
+    def _rotate(self):
+        self.f.close()
+        self.f = None
+        for i in range(self.backups - 1, 0, -1):
+            older = self.path.with_name(f"{self.path.name}.{i}")
+            if older.exists():
+                os.replace(older, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups > 0:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            os.unlink(self.path)
+
+    def flush(self):
+        with self.io_lock:  # taken first so batches reach the file in order
+            with self.cond:
+                lines, self.buf = self.buf, []
+            if not lines:
+                return
+            data = "\n".join(lines) + "\n"
+            try:
+                if self.f is None:
+                    self._open()
+                if self.max_bytes and self.f.tell() + len(data) > self.max_bytes and self.f.tell() > 0:
+                    self._rotate()
+                    self._open()
+                self.f.write(data)
+                self.f.flush()
+            except OSError:
+                self.f = None  # disk full / gone: drop this batch, try again next time
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        self.flush()
+        with self.io_lock:
+            if self.f is not None:
+                self.f.close()
+                self.f = None
+
+def _sigterm_exit(signum, frame):
+    raise SystemExit(128 + signum)
+
+def exit_on_sigterm():
+    """
+    SIGTERM (systemd stop, kill) -> SystemExit: finally blocks and atexit (log flush) run.
+    Only replaces the default action, and only from the main thread (signal rules).
+    """
+    import signal
+    try:
+        if signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+            signal.signal(signal.SIGTERM, _sigterm_exit)
+    except (ValueError, AttributeError):
+        pass  # not the main thread / no SIGTERM on this platform
+
+_LOG = []  # [LogWriter], created on first log()
+
+def configure_logging(dcfg: dict):
+    w = _log_writer()
+    w.max_bytes = int(float(dcfg.get("log_max_mb", 5)) * (1 << 20))
+    w.backups = max(0, int(dcfg.get("log_backups", 3)))
+
+def _log_writer() -> LogWriter:
+    if not _LOG:
+        _LOG.append(LogWriter(log_path()))
+    return _LOG[0]
+
 def log(msg: str):
-    ensure_dirs(_config_dir())
     line = f"[{datetime.now().isoformat(timespec='seconds')}] {msg}"
-    with open(log_path(), "a", encoding="utf-8") as f:
-        f.write(line + "\n")
+    _log_writer().write(line)
 
 
 # ----------------------------
@@ -92,8 +214,10 @@ def open_in_file_manager(path: str):
         if os.name == "nt":
             os.startfile(p)
         elif sys.platform == "darwin":
+            import subprocess
             subprocess.run(["open", p], check=False)
         else:
+            import subprocess
             subprocess.run(["xdg-open", p], check=False)
         SESSION["last_open_dir"] = p
     except Exception as e:
@@ -129,12 +253,53 @@ def _exts_blob(blob: str) -> set[str]:
         out.add(p)
     return out
 
-def build_builtin_categories() -> list[dict]:
+def is_split_part_ext(ext: str) -> bool:
+    """Split archive parts: .001-.999, .r00-.r99, .z01-.z99 (pattern, not a table)."""
+    if len(ext) != 4 or ext[0] != ".":
+        return False
+    tail = ext[2:]
+    if not (tail.isascii() and tail.isdigit()):
+        return False
+    head = ext[1]
+    if head == "r":
+        return True
+    if head == "z":
+        return tail != "00"
+    return head.isascii() and head.isdigit() and ext != ".000"
+
+SPLIT_PART_COUNT = 999 + 100 + 99
+
+# Old-style sets: x.rar + x.r00, x.r01 ... / x.zip + x.z01, x.z02 ...
+SET_HEADS = {".rar": ".r00", ".zip": ".z01"}
+
+def is_set_head(path: Path, ext: str, set_dir=None) -> bool:
+    """
+    x.rar / x.zip with a first .r00 / .z01 part next to it, or already in set_dir
+    (the set's folder, when the parts were moved first). Plain archives stay plain.
+    """
+    part = SET_HEADS.get(ext)
+    if part is None:
+        return False
+    stem = path.name[:-len(ext)]
+    for d in (path.parent, set_dir):
+        if d is not None and any(os.path.lexists(os.path.join(d, stem + x)) for x in (part, part.upper())):
+            return True
+    return False
+
+# Multi-volume archive names, matched as compound suffixes ('#' = any digit).
+VOLUME_SUFFIXES = [
+    "part#.rar", "part##.rar", "part###.rar", "part####.rar",
+    "7z.###", "zip.###", "rar.###", "tar.###",
+]
+_DIGIT_TO_HASH = str.maketrans("0123456789", "##########")
+
+def build_builtin_categories(split_parts=True) -> list[dict]:
     """
     Few folders, wide extension coverage.
 
     "1000+" is done without creating 1000 folders:
     - We add split archive parts .001.. .999 and multipart styles.
+    - split_parts=False leaves them out (the classifier matches them by pattern).
     """
     blobs = {
         "Images": """
@@ -170,6 +335,7 @@ def build_builtin_categories() -> list[dict]:
         """,
         "Archives": """
             zip 7z rar tar gz tgz bz2 tbz2 xz txz zst lz lz4 lzh lha cab
+            tar.gz tar.bz2 tar.xz tar.zst tar.lz tar.lz4 tar.z
             jar war ear
             iso img nrg bin cue mdf mds
         """,
@@ -187,7 +353,7 @@ def build_builtin_categories() -> list[dict]:
             cs vb fs fsx
             java kt kts scala groovy gradle
             py pyw pyi ipynb
-            js jsx mjs cjs ts tsx
+            js jsx mjs cjs ts tsx user.js user.css d.ts
             go rs swift m mm
             php phtml phar
             rb erb rake
@@ -223,6 +389,9 @@ def build_builtin_categories() -> list[dict]:
             "exts": _exts_blob(blob),
         })
 
+    if not split_parts:
+        return cats
+
     # Inflate extension DB massively (still one folder: Archives)
     archive = next(c for c in cats if c["name"] == "Archives")
     for i in range(1, 1000):
@@ -244,6 +413,13 @@ def default_config():
             "ignore_hidden": True,
             "ignore_names": ["desktop.ini", "thumbs.db"],
 
+            # Opt-in: also sort files inside subfolders of Downloads.
+            # max_depth 0 = unlimited. exclude_dirs are relative to Downloads (or absolute).
+            # Category folders under sort_root are never entered.
+            "recursive": False,
+            "max_depth": 3,
+            "exclude_dirs": [],
+
             # You can rename the destination folders without touching extension lists.
             "folder_names": {
                 "Images": "Images",
@@ -265,8 +441,65 @@ def default_config():
             },
 
             # Optional overrides (priority over builtin DB)
-            # [{"ext":".hex","category":"Code"}]
-            "custom_ext_map": []
+            # Compound keys work too: [{"ext":".hex","category":"Code"}, {"ext":".tar.zst","category":"Archives"}]
+            "custom_ext_map": [],
+
+            # Put every part of a multi-volume archive (x.part01.rar, x.7z.001, x.r00) into Archives/<x>/
+            "group_archive_sets": False,
+
+            # Opt-in: look at the first bytes of files with no known extension
+            # (instead of dumping them into unknown_folder). Cached in sniff_cache.json.
+            "sniff_content": False,
+            "sniff_bytes": 8192,
+            "sniff_workers": 8,
+
+            # Move journal (undo/resume): fsync batch size, compaction threshold, runs kept.
+            "journal": True,
+            "journal_fsync_every": 256,
+            "journal_max_mb": 32,
+            "journal_keep_runs": 50,
+
+            # Log rotation: size per file and how many old files to keep (FileSorter.log.1 ...).
+            "log_max_mb": 5,
+            "log_backups": 3,
+
+            # --watch: settle time per file, how long a .part/.crdownload must be
+            # untouched before it is sorted anyway, poll interval when inotify is missing.
+            "watch_debounce_s": 0.5,
+            "watch_incomplete_quiet_s": 300,
+            "watch_poll_s": 1.0,
+
+            # Keep the compiled extension classifier in classifier.json next to this file.
+            "classifier_cache": True,
+
+            # Parallel copies per (source device, destination device) pair.
+            # Same-device moves are a plain rename and never use the pool.
+            "move_workers": 4,
+            # Cross-device copies: compare BLAKE2b of source and copy before the source is
+            # deleted; log throughput for copies of at least copy_log_mb.
+            "copy_verify": False,
+            "copy_log_mb": 64,
+
+            # Byte-identical re-downloads: "off", "skip" (leave in Downloads),
+            # "hardlink" (link to the kept copy) or "move" (into duplicates_folder).
+            "duplicates": "off",
+            "duplicates_folder": "_Duplicates",
+
+            # Several source folders in one --sort: "path" or {"path": ..., <any key above>: override}.
+            # Non-empty = these are sorted instead of "path". Roots on different disks run in
+            # parallel processes (at most root_workers, 0 = one per disk); same-disk roots in turn.
+            "roots": [],
+            "root_workers": 0,
+
+            # Routing rules, checked in order before the category folder (first match wins).
+            # Conditions (all optional, ANDed): ext, category, name_regex, min_size/max_size
+            # ("4G", "500M"), older_than_days/newer_than_days (mtime).
+            # "ext" also matches compound extensions ending in it ("gz" takes "a.tar.gz");
+            # name_regex is searched in the file name, case-insensitively.
+            # Action: "folder" (relative to sort_root, or absolute) [+ "by_date"], or "skip": true.
+            # [{"name": "old installers", "category": "Installers", "older_than_days": 30,
+            #   "folder": "Archive/Installers"}, {"min_size": "4G", "folder": "/mnt/bulk"}]
+            "rules": []
         }
     }
 
@@ -287,6 +520,77 @@ def save_config(cfg):
     log("[cfg] saved")
 
 
+# ----------------------------
+# Run profile (--profile)
+# ----------------------------
+class RunProfile:
+    """
+    Phase timers and counters for one sort run. Only created with --profile;
+    the engine checks `if prof is not None` so a normal run pays nothing.
+
+    Phases: list, stat, classify, sniff, dedupe, collision, journal, mkdir, move.
+    mkdir/move are busy time summed over worker threads (can exceed wall time).
+    """
+
+    PHASES = ("list", "stat", "classify", "sniff", "dedupe", "collision", "journal", "mkdir", "move")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.secs = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.hist = defaultdict(int)  # per-file move latency, power-of-2 microsecond buckets
+        self.bytes_moved = 0
+        self.bytes_planned = 0  # dry run / --plan: nothing moved
+        self.t0 = time.perf_counter()
+        self.wall = None
+
+    def add(self, phase: str, dt: float, n=1):
+        with self.lock:
+            self.secs[phase] += dt
+            self.calls[phase] += n
+
+    def file_moved(self, dt: float):
+        b = int(dt * 1e6).bit_length()
+        with self.lock:
+            self.secs["move"] += dt
+            self.calls["move"] += 1
+            self.hist[b] += 1
+
+    def finish(self):
+        self.wall = time.perf_counter() - self.t0
+
+    def report(self) -> dict:
+        wall = self.wall if self.wall is not None else time.perf_counter() - self.t0
+        names = list(self.PHASES) + sorted(k for k in self.secs if k not in self.PHASES)  # copy:<method>
+        return {
+            "wall_s": round(wall, 6),
+            "phases": {p: {"s": round(self.secs[p], 6), "calls": self.calls[p]}
+                       for p in names if self.calls[p] or self.secs[p]},
+            "bytes_moved": self.bytes_moved,
+            "bytes_planned": self.bytes_planned,
+            "move_latency_us": {f"<{1 << b}": self.hist[b] for b in sorted(self.hist)},
+        }
+
+    def summary(self) -> str:
+        r = self.report()
+        parts = [f"{p}={v['s']:.4f}s/{v['calls']}" for p, v in r["phases"].items()]
+        planned = f" planned={r['bytes_planned']}" if r["bytes_planned"] else ""
+        return f"wall={r['wall_s']:.4f}s " + " ".join(parts) + f" bytes={r['bytes_moved']}" + planned
+
+def _timed_entries(entries, prof: RunProfile):
+    # time spent inside the directory listing itself (scandir + type checks)
+    it = iter(entries)
+    while True:
+        t = time.perf_counter()
+        try:
+            ent = next(it)
+        except StopIteration:
+            prof.add("list", time.perf_counter() - t, 0)
+            return
+        prof.add("list", time.perf_counter() - t)
+        yield ent
+
+
 # ----------------------------
 # Sorting engine
 # ----------------------------
@@ -294,30 +598,621 @@ def safe_mkdir(p: Path, dry=False):
     if not dry:
         p.mkdir(parents=True, exist_ok=True)
 
-def unique_path(dest: Path) -> Path:
-    if not dest.exists():
-        return dest
-    stem, suffix = dest.stem, dest.suffix
-    for i in range(1, 10000):
-        cand = dest.with_name(f"{stem}__{i:03d}{suffix}")
-        if not cand.exists():
-            return cand
-    raise RuntimeError(f"Too many collisions for {dest}")
+class NameIndex:
+    """
+    Names per destination folder, listed once per run with a single scandir
+    and updated as moves are planned. Collisions become dict/set lookups.
+
+    next_free remembers the next __NNN suffix per (folder, stem, suffix),
+    so a pile of "invoice.pdf" downloads does not re-probe 1..n every time.
+    """
+
+    MAX_SUFFIX = 10000
+
+    def __init__(self):
+        self.names = {}      # folder -> set(normcased names)
+        self.next_free = {}  # (folder, stem, suffix) -> int
+        self.lock = threading.Lock()
+
+    def _folder(self, folder: str) -> set:
+        names = self.names.get(folder)
+        if names is None:
+            names = set()
+            try:
+                with os.scandir(folder) as it:
+                    for e in it:
+                        names.add(os.path.normcase(e.name))
+            except OSError:
+                pass  # not created yet
+            self.names[folder] = names
+        return names
+
+    def claim(self, dest: Path, occupied=None, ext=None) -> Path:
+        """
+        Reserve a free name for dest (name, name__001, ...).
+        occupied: a planned name that showed up on disk in the meantime.
+        ext: known (compound) extension, keeps "a__001.tar.gz" instead of "a.tar__001.gz".
+        """
+        folder = str(dest.parent)
+        with self.lock:
+            names = self._folder(folder)
+            if occupied is not None:
+                names.add(os.path.normcase(occupied.name))
+            key = os.path.normcase(dest.name)
+            if key not in names:
+                names.add(key)
+                return dest
+            stem, suffix = dest.stem, dest.suffix
+            if ext and len(dest.name) > len(ext) and dest.name.lower().endswith(ext):
+                stem, suffix = dest.name[:-len(ext)], dest.name[-len(ext):]
+            nk = (folder, os.path.normcase(stem), os.path.normcase(suffix))
+            i = self.next_free.get(nk, 1)
+            while i < self.MAX_SUFFIX:
+                name = f"{stem}__{i:03d}{suffix}"
+                i += 1
+                if os.path.normcase(name) not in names:
+                    names.add(os.path.normcase(name))
+                    self.next_free[nk] = i
+                    return dest.with_name(name)
+        raise RuntimeError(f"Too many collisions for {dest}")
+
+    def release(self, dest: Path):
+        """Give back a claimed name that is not going to be used after all."""
+        with self.lock:
+            names = self.names.get(str(dest.parent))
+            if names is not None:
+                names.discard(os.path.normcase(dest.name))
+
+def unique_path(dest: Path, index=None) -> Path:
+    return (index or NameIndex()).claim(dest)
 
 def is_probably_incomplete(name: str) -> bool:
     low = name.lower()
     return low.endswith(".crdownload") or low.endswith(".part") or low.endswith(".tmp")
 
-def build_ext_to_category(cfg) -> tuple[dict[str, str], dict[str, dict]]:
-    dcfg = cfg["downloads"]
-    folder_names = dcfg.get("folder_names", {}) or {}
+def _norm_dir(p) -> str:
+    return os.path.normcase(os.path.abspath(str(p)))
 
-    cats = build_builtin_categories()
+def scan_files(root: Path, recursive=False, max_depth=0, skip_dirs=(), ignore_hidden=True):
+    """
+    Stream files below root as os.DirEntry (cached type/stat info).
+
+    - Default: only root files (safe mode).
+    - recursive: descend into subfolders, max_depth levels deep (0 = unlimited).
+    - skip_dirs: folders that are never entered (category folders, excludes).
+    """
+    skip = {_norm_dir(d) for d in skip_dirs}
+    stack = [(str(root), 0)]
+    while stack:
+        folder, depth = stack.pop()
+        try:
+            it = os.scandir(folder)
+        except OSError as e:
+            log(f"[scan] cannot list {folder}: {e}")
+            continue
+        with it:
+            for e in it:
+                try:
+                    is_dir = e.is_dir()
+                except OSError:
+                    continue
+                if not is_dir:
+                    yield e
+                    continue
+                if not recursive or e.is_symlink():
+                    continue
+                if ignore_hidden and e.name.startswith("."):
+                    continue
+                if max_depth and depth + 1 > max_depth:
+                    continue
+                if _norm_dir(e.path) in skip:
+                    continue
+                stack.append((e.path, depth + 1))
+
+def entry_stat(ent):
+    """ent.stat(), or the link's own stat for a dangling symlink (it is moved like any file)."""
+    try:
+        return ent.stat()
+    except OSError:
+        if ent.is_symlink():
+            return ent.stat(follow_symlinks=False)
+        raise
+
+def path_stat(path):
+    """entry_stat() for a plain path: os.stat, or os.lstat when it is a dangling symlink."""
+    try:
+        return os.stat(path)
+    except OSError:
+        if os.path.islink(path):
+            return os.lstat(path)
+        raise
+
+def _device_of(p: Path) -> int:
+    # Destination folders may not exist yet: use the nearest existing parent.
+    for q in (p, *p.parents):
+        try:
+            return os.stat(q).st_dev
+        except OSError:
+            continue
+    return -1
+
+AT_FDCWD = -100
+RENAME_NOREPLACE = 1
+_RENAMEAT2 = []  # [fn or None], resolved on first use
+_LIBC = []
+
+def _libc():
+    # dlopen(NULL): libc is already mapped into the interpreter. ctypes.util.find_library
+    # may shell out to ldconfig/gcc, tens of ms on every --sort start.
+    if not _LIBC:
+        import ctypes
+        try:
+            lib = ctypes.CDLL(None, use_errno=True)
+        except OSError:
+            import ctypes.util
+            lib = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        _LIBC.append(lib)
+    return _LIBC[0]
+
+def _renameat2():
+    if not _RENAMEAT2:
+        fn = None
+        if sys.platform.startswith("linux"):
+            try:
+                import ctypes
+                fn = _libc().renameat2
+                fn.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+                fn.restype = ctypes.c_int
+            except (OSError, AttributeError):
+                fn = None  # old glibc / no libc: fall back below
+        _RENAMEAT2.append(fn)
+    return _RENAMEAT2[0]
+
+def rename_noreplace(src, dst):
+    """
+    Atomic rename that never overwrites (FileExistsError instead).
+    Linux: renameat2(RENAME_NOREPLACE). Windows: os.rename already refuses.
+    Elsewhere / unsupported fs: link + unlink (also atomic, also no-clobber).
+    """
+    if os.name == "nt":
+        os.rename(src, dst)
+        return
+    fn = _renameat2()
+    if fn is not None:
+        import ctypes
+        if fn(AT_FDCWD, os.fsencode(str(src)), AT_FDCWD, os.fsencode(str(dst)), RENAME_NOREPLACE) == 0:
+            return
+        err = ctypes.get_errno()
+        if err == errno.EEXIST:
+            raise FileExistsError(err, os.strerror(err), str(dst))
+        if err not in (errno.ENOSYS, errno.EINVAL, errno.ENOTSUP):
+            raise OSError(err, os.strerror(err), str(src))
+    try:
+        os.link(src, dst, follow_symlinks=False)
+    except (PermissionError, NotImplementedError):
+        # no hard links here (e.g. FAT, some network shares): last-resort check + rename
+        if os.path.lexists(dst):
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), str(dst))
+        os.rename(src, dst)
+        return
+    os.unlink(src)
+
+COPY_BUFSIZE = 4 << 20
+FICLONE = 0x40049409  # _IOW(0x94, 9, int)
+# "this fd pair can't do that": try the next method (only before any byte was written)
+_NO_OFFLOAD = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTTY, errno.ETXTBSY}
+
+def _copy_reflink(sfd, dfd, size, h):
+    if not sys.platform.startswith("linux"):
+        return None
+    import fcntl
+    try:
+        fcntl.ioctl(dfd, FICLONE, sfd)  # btrfs/XFS: shares extents, nothing copied
+    except OSError as e:
+        if e.errno in _NO_OFFLOAD:
+            return None
+        raise
+    return size
+
+def _copy_range(sfd, dfd, size, h):
+    if not hasattr(os, "copy_file_range"):
+        return None
+    done = 0
+    while True:
+        try:
+            n = os.copy_file_range(sfd, dfd, 1 << 30)
+        except OSError as e:
+            if done == 0 and e.errno in _NO_OFFLOAD:
+                return None
+            raise
+        if n == 0:
+            if done == 0 and size > 0:
+                return None  # some kernels/filesystems report 0 instead of EXDEV
+            return done
+        done += n
+
+def _copy_sendfile(sfd, dfd, size, h):
+    if not hasattr(os, "sendfile") or not sys.platform.startswith("linux"):
+        return None  # file -> file sendfile is Linux only
+    done = 0
+    while True:
+        try:
+            n = os.sendfile(dfd, sfd, done, 1 << 30)
+        except OSError as e:
+            if done == 0 and e.errno in _NO_OFFLOAD:
+                return None
+            raise
+        if n == 0:
+            return done
+        done += n
+
+def _copy_readinto(sfd, dfd, size, h):
+    buf = bytearray(COPY_BUFSIZE)
+    view = memoryview(buf)
+    done = 0
+    with open(sfd, "rb", buffering=0, closefd=False) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                return done
+            chunk = view[:n]
+            if h is not None:
+                h.update(chunk)  # the source digest for verify comes for free here
+            while chunk:
+                chunk = chunk[os.write(dfd, chunk):]
+            done += n
+
+_COPY_METHODS = (("reflink", _copy_reflink), ("copy_file_range", _copy_range),
+                 ("sendfile", _copy_sendfile), ("readinto", _copy_readinto))
+
+def _blake2_file(path) -> str:
+    import hashlib, mmap
+    h = hashlib.blake2b(digest_size=32)
+    with open(path, "rb", buffering=0) as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                h.update(m)
+                return h.hexdigest()
+        except (ValueError, OSError):
+            pass  # empty / special file
+        buf = bytearray(COPY_BUFSIZE)
+        view = memoryview(buf)
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.hexdigest()
+
+def copy_file_fast(src, dst, verify=False, skip=None) -> dict:
+    """
+    Copies src into a new file dst (must not exist) plus its metadata, like shutil.copy2,
+    through the fastest path that works: reflink, copy_file_range, sendfile, readinto.
+    Methods that turn out unsupported are added to `skip` (keep one set per device pair).
+    verify: BLAKE2b of source and copy must match, else OSError(EIO) and dst is removed.
+    Returns {"bytes", "method", "secs"}.
+    """
+    import shutil
+    if os.path.islink(src):
+        shutil.copy2(str(src), str(dst), follow_symlinks=False)
+        return {"bytes": 0, "method": "symlink", "secs": 0.0}
+    skip = set() if skip is None else skip
+    t = time.perf_counter()
+    if verify:
+        import hashlib
+        h = hashlib.blake2b(digest_size=32)
+    else:
+        h = None
+    try:
+        with open(src, "rb", buffering=0) as fi, open(dst, "xb", buffering=0) as fo:
+            sfd, dfd = fi.fileno(), fo.fileno()
+            size = os.fstat(sfd).st_size
+            for method, fn in _COPY_METHODS:
+                if method in skip:
+                    continue
+                n = fn(sfd, dfd, size, h if method == "readinto" else None)
+                if n is not None:
+                    break
+                skip.add(method)
+        shutil.copystat(str(src), str(dst))
+        if verify:
+            want = h.hexdigest() if method == "readinto" else _blake2_file(src)
+            if _blake2_file(dst) != want:
+                raise OSError(errno.EIO, "copy does not match the source (checksum)", str(dst))
+    except BaseException:
+        try:
+            os.unlink(dst)
+        except OSError:
+            pass
+        raise
+    return {"bytes": n, "method": method, "secs": time.perf_counter() - t}
+
+def copy_options(dcfg: dict) -> dict:
+    return {"verify": bool(dcfg.get("copy_verify", False)),
+            "log_min_bytes": int(float(dcfg.get("copy_log_mb", 64)) * (1 << 20))}
+
+class MoveExecutor:
+    """
+    Runs planned moves.
+
+    - Same device: no-clobber rename right away (instant, no copy); EXDEV anyway
+      (bind mounts) falls back to the copy path.
+    - Cross device: one bounded thread pool per (src_dev, dst_dev) pair,
+      copied with copy_file_fast() (optionally verified) before the source goes.
+    - on_done(item, err) is always called from the caller's thread,
+      so counters kept there stay exact.
+    """
+
+    def __init__(self, workers=4, dry=False, on_done=None, index=None, prof=None,
+                 verify=False, log_min_bytes=64 << 20):
+        self.workers = max(1, int(workers or 1))
+        self.prof = prof
+        self.verify = verify
+        self.log_min_bytes = log_min_bytes
+        self.copy_skip = {}  # (src_dev, dst_dev) -> copy methods that don't work there
+        if prof is not None:
+            self._move = self._timed_move
+        self.index = index or NameIndex()
+        self.dry = dry
+        self.on_done = on_done or (lambda item, err: None)
+        self.pools = {}
+        self.pending = {}
+        self.dev_cache = {}
+        self.made_dirs = set()  # created (or seen) this run: one mkdir per folder, not per file
+        self.no_rename = set()  # device pairs that answered EXDEV despite equal st_dev
+
+    def _dev(self, folder: Path) -> int:
+        k = str(folder)
+        dev = self.dev_cache.get(k)
+        if dev is None:
+            dev = self.dev_cache[k] = _device_of(folder)
+        return dev
+
+    def _mkdir(self, folder: Path, item=None):
+        k = str(folder)
+        if k not in self.made_dirs:
+            t = time.perf_counter()
+            new = []  # what this call creates: journaled so --undo removes only those
+            p = folder
+            while not os.path.isdir(p) and p.parent != p:
+                new.append(str(p))
+                p = p.parent
+            folder.mkdir(parents=True, exist_ok=True)
+            self.made_dirs.add(k)
+            if new and item is not None:
+                item["made"] = new
+            if self.prof is not None:
+                self.prof.add("mkdir", time.perf_counter() - t)
+
+    def _timed_move(self, item):
+        t = time.perf_counter()
+        try:
+            MoveExecutor._move(self, item)
+        finally:
+            self.prof.file_moved(time.perf_counter() - t)
+
+    def _place(self, item, put):
+        """
+        put(dest) must fail with FileExistsError instead of overwriting. On a clash
+        (another process took the name since planning) the index hands out the next one.
+        """
+        while True:
+            try:
+                put(item["dest"])
+                return
+            except FileExistsError:
+                item["dest"] = self.index.claim(item["dest_dir"] / item["src"].name,
+                                                occupied=item["dest"], ext=item.get("ext"))
+
+    def _move(self, item):
+        self._mkdir(item["dest_dir"], item)
+        src = item["src"]
+        if item.get("link_to"):
+            # duplicate: hard link to the kept copy instead of a second set of bytes
+            try:
+                self._place(item, lambda dest: os.link(item["link_to"], dest))
+                os.unlink(src)
+                return
+            except OSError:
+                pass  # other device / no hard links here: plain move
+        if item["same_dev"]:
+            try:
+                self._place(item, lambda dest: rename_noreplace(src, dest))
+                return
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                # same st_dev but still EXDEV (two bind mounts of one fs): copy instead,
+                # and send the rest of this device pair to the copy pool
+                self.no_rename.add(item["dev_key"])
+        # cross device: copy next to the target under a hidden temp name, then publish atomically
+        tmp = item["dest_dir"] / f".{item['dest'].name}.{APP_BASENAME}.part"  # dest names are unique per run
+        if os.path.lexists(tmp):
+            os.unlink(tmp)  # left over from a crash
+        skip = self.copy_skip.setdefault((self._dev(src.parent), self._dev(item["dest_dir"])), set())
+        info = copy_file_fast(src, tmp, verify=self.verify, skip=skip)
+        try:
+            self._place(item, lambda dest: rename_noreplace(tmp, dest))
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        os.unlink(src)
+        self._copied(item, info)
+
+    def _copied(self, item, info):
+        item["copy"] = info
+        if self.prof is not None:
+            self.prof.add(f"copy:{info['method']}", info["secs"])
+        if info["bytes"] >= self.log_min_bytes:
+            rate = info["bytes"] / max(info["secs"], 1e-9) / (1 << 20)
+            log(f"[copy] {item['src'].name}: {info['bytes'] / (1 << 20):.0f} MiB via {info['method']}"
+                f" in {info['secs']:.2f}s ({rate:.0f} MiB/s)")
+
+    def submit(self, item: dict):
+        if self.dry:
+            self.on_done(item, None)
+            return
+        key = item["dev_key"] = (self._dev(item["src"].parent), self._dev(item["dest_dir"]))
+        item["same_dev"] = key[0] == key[1] and key[0] != -1 and key not in self.no_rename
+        if item["same_dev"]:
+            try:
+                self._move(item)
+                self.on_done(item, None)
+            except Exception as e:
+                self.on_done(item, e)
+            return
+
+        pool = self.pools.get(key)
+        if pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            pool = self.pools[key] = ThreadPoolExecutor(max_workers=self.workers)
+        self.pending[pool.submit(self._move, item)] = item
+        # bounded backlog: don't queue the whole folder in memory
+        if len(self.pending) > self.workers * len(self.pools) * 16:
+            self._drain("FIRST_COMPLETED")
+
+    def cancel(self):
+        """Drops queued cross-device moves that have not started; they count as skipped."""
+        for fut, item in list(self.pending.items()):
+            if fut.cancel():
+                del self.pending[fut]
+                self.on_done(item, RuntimeError("cancelled"))
+
+    def wait(self):
+        """Blocks until every submitted move has finished."""
+        if self.pending:
+            self._drain("ALL_COMPLETED")
+
+    def _drain(self, mode):
+        from concurrent.futures import wait
+        done, _ = wait(list(self.pending), return_when=mode)
+        for fut in done:
+            item = self.pending.pop(fut)
+            self.on_done(item, fut.exception())
+
+    def close(self):
+        try:
+            if self.pending:
+                self._drain("ALL_COMPLETED")
+        finally:
+            for pool in self.pools.values():
+                pool.shutdown(wait=True)
+            self.pools.clear()
+
+CLASSIFIER_VERSION = 2
+_CLASSIFIERS = {}
+
+def classifier_cache_path() -> Path:
+    return _config_dir() / "classifier.json"
+
+class ExtClassifier:
+    """
+    Compiled extension -> category lookup.
+
+    Explicit extensions live in one dict; split archive parts (.001, .r00, .z01 ...)
+    are matched by is_split_part_ext() instead of ~1200 table entries.
+    Compound extensions (.tar.gz, .user.js, .part03.rar) sit in a reversed-suffix
+    trie, so classify() finds the longest known one in one pass over the name.
+    len() still reports the full mapped extension count.
+    """
+
+    END = "\0"
+
+    def __init__(self, ext_to_cat: dict, cat_meta: dict, split_cat="Archives"):
+        self.ext_to_cat = ext_to_cat
+        self.cat_meta = cat_meta
+        self.split_cat = split_cat
+        # explicit entries that override a split part pattern are counted once
+        overlap = sum(1 for e in ext_to_cat if is_split_part_ext(e))
+        self.size = len(ext_to_cat) + (SPLIT_PART_COUNT - overlap if split_cat else 0)
+
+        self.trie = {}
+        self.depth = 1
+        for ext, cat in ext_to_cat.items():
+            if ext.count(".") > 1:
+                self._insert(ext[1:], cat, False)
+        if split_cat:
+            for pat in VOLUME_SUFFIXES:
+                self._insert(pat, split_cat, True)
+
+    def _insert(self, compound: str, cat: str, volume: bool):
+        comps = compound.split(".")
+        node = self.trie
+        for comp in reversed(comps):
+            node = node.setdefault(comp, {})
+        node.setdefault(self.END, (cat, volume))
+        self.depth = max(self.depth, len(comps))
+
+    def get(self, ext: str, default=None):
+        cat = self.ext_to_cat.get(ext)
+        if cat is None and self.split_cat and is_split_part_ext(ext):
+            return self.split_cat
+        return default if cat is None else cat
+
+    def classify(self, name: str) -> tuple[str, str | None, bool]:
+        """
+        Returns (ext, category, volume) for a file name.
+        ext is the longest known (compound) extension, else the plain last suffix.
+        volume: part of a split / multi-volume archive set.
+        """
+        parts = name.lower().rsplit(".", self.depth)  # bounded: never more than depth splits
+        if len(parts) < 2 or (not parts[0] and len(parts) == 2) or not parts[-1]:
+            return "", None, False
+
+        ext = "." + parts[-1]
+        cat = self.get(ext)
+        volume = cat is not None and cat == self.split_cat and is_split_part_ext(ext)
+
+        node = self.trie
+        stop = 1 if parts[0] else 2  # leading dot is not a suffix
+        for k in range(len(parts) - 1, stop - 1, -1):
+            comp = parts[k]
+            nxt = node.get(comp)
+            if nxt is None:
+                nxt = node.get(comp.translate(_DIGIT_TO_HASH))
+            if nxt is None:
+                break
+            node = nxt
+            hit = node.get(self.END)
+            if hit is not None and k < len(parts) - 1:
+                ext = "." + ".".join(parts[k:])
+                cat, volume = hit
+        return ext, cat, volume
+
+    def __len__(self):
+        return self.size
+
+    def expanded(self) -> dict[str, str]:
+        out = {}
+        if self.split_cat:
+            for i in range(1, 1000):
+                out[f".{i:03d}"] = self.split_cat
+            for i in range(0, 100):
+                out[f".r{i:02d}"] = self.split_cat
+            for i in range(1, 100):
+                out[f".z{i:02d}"] = self.split_cat
+        out.update(self.ext_to_cat)
+        return out
+
+    def to_json(self, key: str) -> dict:
+        return {"key": key, "ext_to_cat": self.ext_to_cat, "cat_meta": self.cat_meta, "split_cat": self.split_cat}
+
+def _classifier_key(dcfg: dict) -> str:
+    # only what _compile_classifier reads: roots that differ in path/sort_root share one classifier.
+    # The canonical JSON itself is the key (small, exact, and no hashlib import at startup).
+    return json.dumps([CLASSIFIER_VERSION, dcfg.get("folder_names"), dcfg.get("custom_ext_map")],
+                      sort_keys=True, separators=(",", ":"), default=str)
+
+def _compile_classifier(dcfg: dict) -> ExtClassifier:
+    folder_names = dcfg.get("folder_names", {}) or {}
 
     cat_meta: dict[str, dict] = {}
     ext_to_cat: dict[str, str] = {}
 
-    for c in cats:
+    for c in build_builtin_categories(split_parts=False):
         cat = c["name"]
         folder = folder_names.get(cat) or c["folder_default"]
         cat_meta[cat] = {"folder": folder, "by_date": bool(c["by_date"])}
@@ -336,79 +1231,1795 @@ def build_ext_to_category(cfg) -> tuple[dict[str, str], dict[str, dict]]:
             cat_meta[cat] = {"folder": folder_names.get(cat) or cat, "by_date": False}
         ext_to_cat[ext] = cat
 
-    return ext_to_cat, cat_meta
+    return ExtClassifier(ext_to_cat, cat_meta, split_cat="Archives")
 
-def sort_downloads(cfg) -> dict:
+def compile_classifier(cfg) -> ExtClassifier:
+    """
+    Memoized by the classifier-relevant downloads config (canonical JSON of it, see _classifier_key).
+    Unless "classifier_cache" is false, it is also persisted next to config.json.
+    """
     dcfg = cfg["downloads"]
-    downloads = expand_path(dcfg["path"])
-    sr = (dcfg.get("sort_root", "") or "").strip()
-    sort_root = expand_path(sr) if sr else downloads
+    key = _classifier_key(dcfg)
+    clf = _CLASSIFIERS.get(key)
+    if clf is not None:
+        return clf
 
-    dry_run = bool(dcfg.get("dry_run", False))
-    unknown_folder = dcfg.get("unknown_folder", "_Other")
-    ignore_hidden = bool(dcfg.get("ignore_hidden", True))
-    ignore_names = set((n or "").lower() for n in dcfg.get("ignore_names", []))
+    persist = bool(dcfg.get("classifier_cache", True))
+    if persist:
+        try:
+            with open(classifier_cache_path(), "r", encoding="utf-8") as f:
+                snap = json.load(f)
+            if snap.get("key") == key:
+                clf = ExtClassifier(snap["ext_to_cat"], snap["cat_meta"], snap.get("split_cat"))
+        except (OSError, ValueError, KeyError):
+            clf = None
+
+    if clf is None:
+        clf = _compile_classifier(dcfg)
+        if persist:
+            try:
+                ensure_dirs(_config_dir())
+                tmp = classifier_cache_path().with_suffix(".tmp")
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(clf.to_json(key), f)
+                os.replace(tmp, classifier_cache_path())
+            except OSError as e:
+                log(f"[cfg] classifier cache not written: {e}")
+
+    if len(_CLASSIFIERS) >= 8:
+        _CLASSIFIERS.clear()  # a handful of configs (roots with overrides) at a time is all we need
+    _CLASSIFIERS[key] = clf
+    return clf
 
-    ext_to_cat, cat_meta = build_ext_to_category(cfg)
+def build_ext_to_category(cfg) -> tuple[dict[str, str], dict[str, dict]]:
+    # Fully inflated table (every split part listed). The engine uses compile_classifier().
+    clf = compile_classifier(cfg)
+    return clf.expanded(), clf.cat_meta
 
-    moved, skipped = 0, 0
-    moves = []
-    counts = defaultdict(int)
+# ----------------------------
+# Routing rules (config "rules")
+# ----------------------------
+_SIZE_UNITS = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30, "t": 1 << 40}
+_RULES = {}
+
+def parse_size(v) -> int:
+    """1024, "500M", "4G", "1.5TB" -> bytes (binary units)."""
+    if isinstance(v, (int, float)):
+        return int(v)
+    m = re.fullmatch(r"\s*([\d.]+)\s*([kmgt]?)i?b?\s*", str(v).lower())
+    if not m:
+        raise ValueError(f"bad size: {v!r}")
+    return int(float(m.group(1)) * _SIZE_UNITS[m.group(2)])
+
+class Rule:
+    __slots__ = ("idx", "label", "exts", "cats", "pattern", "min_size", "max_size",
+                 "min_age", "max_age", "needs_stat", "folder", "by_date", "skip")
+
+    def __init__(self, idx: int, spec: dict):
+        def listed(v):
+            return [v] if isinstance(v, str) else list(v)
+
+        self.idx = idx
+        self.label = spec.get("name") or f"rule {idx + 1}"
+        exts = spec.get("ext")
+        self.exts = None if exts is None else {e.lower() if e.startswith(".") else "." + e.lower() for e in listed(exts)}
+        cats = spec.get("category")
+        self.cats = None if cats is None else set(listed(cats))
+        self.pattern = spec.get("name_regex") or None
+        if self.pattern is not None:
+            re.compile(self.pattern)  # fail early, with the rule name in the error
+        self.min_size = parse_size(spec["min_size"]) if spec.get("min_size") is not None else None
+        self.max_size = parse_size(spec["max_size"]) if spec.get("max_size") is not None else None
+        self.min_age = float(spec["older_than_days"]) * 86400 if spec.get("older_than_days") is not None else None
+        self.max_age = float(spec["newer_than_days"]) * 86400 if spec.get("newer_than_days") is not None else None
+        self.needs_stat = any(x is not None for x in (self.min_size, self.max_size, self.min_age, self.max_age))
+        self.skip = bool(spec.get("skip", False))
+        self.folder = spec.get("folder")
+        self.by_date = spec.get("by_date")  # None = like the file's category
+        if not self.skip and not self.folder:
+            raise ValueError("needs a folder (or skip: true)")
+
+class RuleTable:
+    """
+    Ordered routing rules, compiled once per config. First matching rule wins.
+
+    - Candidates are indexed by extension / category and memoized per (ext, category),
+      so a file no rule can apply to costs one dict lookup. An ext rule also takes
+      compound extensions that end in it: ".gz" matches ".tar.gz".
+    - name_regex is searched case-insensitively (re.I), like extensions are compared.
+      All patterns run as one regex of lookaheads: one match call tells which rules'
+      patterns hit.
+    - Size/age conditions stat the file only when a candidate rule reaches them.
+    """
 
-    if not downloads.exists():
-        raise FileNotFoundError(f"Downloads not found: {downloads}")
+    def __init__(self, specs: list):
+        self.rules = []
+        for i, spec in enumerate(specs):
+            try:
+                self.rules.append(Rule(i, spec))
+            except (ValueError, TypeError, KeyError, AttributeError, re.error) as e:
+                name = spec.get("name") if isinstance(spec, dict) else None
+                raise ValueError(f"rules[{i}]{f' ({name})' if name else ''}: {e}")
+        self.by_ext, self.by_cat, self.any = defaultdict(list), defaultdict(list), []
+        for r in self.rules:
+            if r.exts is not None:
+                for e in r.exts:
+                    self.by_ext[e].append(r.idx)
+            elif r.cats is not None:
+                for c in r.cats:
+                    self.by_cat[c].append(r.idx)
+            else:
+                self.any.append(r.idx)
+        self.cands = {}
+
+        named = [r for r in self.rules if r.pattern is not None]
+        self.name_re = None
+        if named and not any(re.search(r"\\[1-9]|\(\?P=", r.pattern) for r in named):
+            try:
+                self.name_re = re.compile("".join(f"(?:(?=(?P<r{r.idx}>.*?(?:{r.pattern}))))?" for r in named),
+                                          re.I | re.S)
+            except re.error:
+                self.name_re = None  # clashing group names: fall back to one regex per rule
+        self.rule_re = {r.idx: re.compile(r.pattern, re.I | re.S) for r in named}
+
+    def __len__(self):
+        return len(self.rules)
+
+    def candidates(self, ext: str, cat) -> tuple:
+        key = (ext, cat)
+        c = self.cands.get(key)
+        if c is None:
+            ids = set(self.by_cat.get(cat, ())) | set(self.any)
+            i = 0
+            while i >= 0:  # ".tar.gz", then ".gz"
+                ids.update(self.by_ext.get(ext[i:], ()))
+                i = ext.find(".", i + 1)
+            c = tuple(self.rules[i] for i in sorted(ids))
+            if len(self.cands) >= 4096:
+                self.cands.clear()
+            self.cands[key] = c
+        return c
+
+    def _name_hits(self, name: str) -> set:
+        if self.name_re is not None:
+            return {int(k[1:]) for k, v in self.name_re.match(name).groupdict().items() if v is not None}
+        return {i for i, rx in self.rule_re.items() if rx.search(name)}
+
+    def match(self, ent, name: str, ext: str, cat, now: float):
+        """First rule that applies to this file, else None. ent: DirEntry (stat is cached)."""
+        cands = self.candidates(ext, cat)
+        if not cands:
+            return None
+        hits = None
+        for r in cands:
+            if r.cats is not None and cat not in r.cats:
+                continue
+            if r.pattern is not None:
+                if hits is None:
+                    hits = self._name_hits(name)
+                if r.idx not in hits:
+                    continue
+            if r.needs_stat:
+                st = entry_stat(ent)
+                if r.min_size is not None and st.st_size < r.min_size:
+                    continue
+                if r.max_size is not None and st.st_size > r.max_size:
+                    continue
+                age = now - st.st_mtime
+                if r.min_age is not None and age < r.min_age:
+                    continue
+                if r.max_age is not None and age > r.max_age:
+                    continue
+            return r
+        return None
 
-    # Safe mode: only root files, not subfolders.
-    for p in downloads.iterdir():
-        if p.is_dir():
-            continue
-        if ignore_hidden and p.name.startswith("."):
-            continue
-        if p.name.lower() in ignore_names:
+def compile_rules(dcfg: dict):
+    """RuleTable for downloads.rules (memoized), or None when there are no rules."""
+    specs = dcfg.get("rules") or []
+    if not specs:
+        return None
+    key = json.dumps(specs, sort_keys=True, default=str)
+    table = _RULES.get(key)
+    if table is None:
+        if len(_RULES) >= 8:
+            _RULES.clear()
+        table = _RULES[key] = RuleTable(specs)
+    return table
+
+# ----------------------------
+# Content sniffing (opt-in, for unknown files)
+# ----------------------------
+# (offset, magic, category). Checked against a bounded header only.
+MAGIC_SIGNATURES = [
+    (0, b"\xff\xd8\xff", "Images"),
+    (0, b"\x89PNG\r\n\x1a\n", "Images"),
+    (0, b"GIF87a", "Images"),
+    (0, b"GIF89a", "Images"),
+    (0, b"II*\x00", "Images"),
+    (0, b"MM\x00*", "Images"),
+    (0, b"8BPS", "Images"),
+    (0, b"\x00\x00\x01\x00", "Images"),
+    (0, b"<svg", "Images"),
+    (0, b"\x76\x2f\x31\x01", "Images"),          # OpenEXR
+    (4, b"ftypheic", "Images"),
+    (4, b"ftypheix", "Images"),
+    (4, b"ftypmif1", "Images"),
+    (4, b"ftypavif", "Images"),
+    (4, b"ftypM4A", "Audio"),
+    (4, b"ftyp", "Videos"),                      # isom/mp42/qt/3gp...
+    (0, b"\x1a\x45\xdf\xa3", "Videos"),          # mkv/webm
+    (0, b"\x30\x26\xb2\x75\x8e\x66\xcf\x11", "Videos"),  # asf/wmv
+    (0, b"FLV\x01", "Videos"),
+    (0, b"\x00\x00\x01\xba", "Videos"),
+    (0, b"\x00\x00\x01\xb3", "Videos"),
+    (0, b"ID3", "Audio"),
+    (0, b"\xff\xfb", "Audio"),
+    (0, b"\xff\xf3", "Audio"),
+    (0, b"\xff\xf2", "Audio"),
+    (0, b"fLaC", "Audio"),
+    (0, b"OggS", "Audio"),
+    (0, b"MThd", "Audio"),
+    (0, b"%PDF", "Documents"),
+    (0, b"{\\rtf", "Documents"),
+    (0, b"AT&TFORM", "Documents"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "Documents"),  # OLE (doc/xls/ppt/msg)
+    (0, b"PK\x03\x04", "Archives"),              # refined by _sniff_zip()
+    (0, b"7z\xbc\xaf\x27\x1c", "Archives"),
+    (0, b"Rar!\x1a\x07", "Archives"),
+    (0, b"\x1f\x8b", "Archives"),
+    (0, b"BZh", "Archives"),
+    (0, b"\xfd7zXZ\x00", "Archives"),
+    (0, b"\x28\xb5\x2f\xfd", "Archives"),
+    (0, b"\x04\x22\x4d\x18", "Archives"),
+    (0, b"MSCF", "Archives"),
+    (257, b"ustar", "Archives"),
+    (0, b"MZ", "Installers"),
+    (0, b"\xed\xab\xee\xdb", "Installers"),      # rpm
+    (0, b"!<arch>\ndebian-binary", "Installers"),
+    (0, b"xar!", "Installers"),                  # pkg
+    (8, b"AI\x02", "Installers"),                # AppImage (type 2)
+    (0, b"#!", "Code"),
+    (0, b"<?php", "Code"),
+    (0, b"<?xml", "Code"),
+    (0, b"<!DOCTYPE html", "Code"),
+    (0, b"<!doctype html", "Code"),
+    (0, b"<html", "Code"),
+    (0, b"glTF", "3D_CAD"),
+    (0, b"Kaydara FBX Binary", "3D_CAD"),
+    (0, b"BLENDER", "3D_CAD"),
+    (0, b"ISO-10303-21", "3D_CAD"),
+    (0, b"AC10", "3D_CAD"),                      # dwg
+    (0, b"solid ", "3D_CAD"),                    # ascii stl
+    (0, b"OTTO", "Fonts"),
+    (0, b"\x00\x01\x00\x00\x00", "Fonts"),
+    (0, b"true\x00", "Fonts"),
+    (0, b"wOFF", "Fonts"),
+    (0, b"wOF2", "Fonts"),
+    (0, b"-----BEGIN ", "Keys_Certs"),
+    (0, b"KDMV", "VM_Disk"),
+    (0, b"conectix", "VM_Disk"),
+    (0, b"vhdxfile", "VM_Disk"),
+    (0, b"QFI\xfb", "VM_Disk"),
+    (0, b"<<< Oracle VM VirtualBox Disk Image >>>", "VM_Disk"),
+    (0, b"L\x00\x00\x00\x01\x14\x02\x00", "Shortcuts"),
+    (0, b"[InternetShortcut]", "Shortcuts"),
+    (0, b"[Desktop Entry]", "Shortcuts"),
+    (0, b"SQLite format 3\x00", "Data"),
+    (0, b"PAR1", "Data"),
+    (0, b"ARROW1", "Data"),
+    (4, b"Standard Jet DB", "Data"),
+    (4, b"Standard ACE DB", "Data"),
+]
+
+# RIFF containers: form type at offset 8
+_RIFF_TYPES = {b"WEBP": "Images", b"WAVE": "Audio", b"AVI ": "Videos"}
+# ZIP containers: first member names give away the real format
+_ZIP_HINTS = [
+    (b"word/", "Documents"),
+    (b"mimetypeapplication/epub+zip", "Documents"),
+    (b"xl/", "Spreadsheets"),
+    (b"ppt/", "Presentations"),
+    (b"AndroidManifest.xml", "Installers"),
+    (b"AppxManifest.xml", "Installers"),
+]
+_ISO_OFFSET = 0x8001  # "CD001"
+SNIFF_BATCH = 256
+
+class MagicTable:
+    """Signatures compiled into: first byte -> [(offset, magic, cat)], plus the few non-zero offsets."""
+
+    def __init__(self, signatures=MAGIC_SIGNATURES):
+        self.at0 = defaultdict(list)
+        self.other = []
+        for off, magic, cat in signatures:
+            if off == 0:
+                self.at0[magic[0]].append((magic, cat))
+            else:
+                self.other.append((off, magic, cat))
+        for lst in self.at0.values():
+            lst.sort(key=lambda x: -len(x[0]))  # longest (most specific) first
+
+    def match(self, head: bytes) -> str | None:
+        if not head:
+            return None
+        if head[:4] == b"RIFF":
+            return _RIFF_TYPES.get(head[8:12])
+        if head[:4] == b"FORM" and head[8:12] in (b"AIFF", b"AIFC"):
+            return "Audio"
+        for off, magic, cat in self.other:
+            if head[off:off + len(magic)] == magic:
+                return cat
+        for magic, cat in self.at0.get(head[0], ()):
+            if head.startswith(magic):
+                if magic == b"PK\x03\x04":
+                    return self._zip(head) or cat
+                return cat
+        return None
+
+    @staticmethod
+    def _zip(head: bytes) -> str | None:
+        for hint, cat in _ZIP_HINTS:
+            if hint in head:
+                return cat
+        return None
+
+def sniff_cache_path() -> Path:
+    return _config_dir() / "sniff_cache.json"
+
+class JsonStore:
+    """Small on-disk key/value cache (one JSON file, newest max_items kept)."""
+
+    def __init__(self, path: Path, max_items=50000):
+        self.path = path
+        self.max_items = max_items
+        self.dirty = False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def put(self, key, value):
+        self.data.pop(key, None)  # re-insert = newest
+        self.data[key] = value
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        if len(self.data) > self.max_items:
+            keys = list(self.data)[-self.max_items:]
+            self.data = {k: self.data[k] for k in keys}
+        try:
+            ensure_dirs(self.path.parent)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.data, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            log(f"[cache] {self.path.name} not written: {e}")
+        self.dirty = False
+
+class ContentSniffer:
+    """
+    Reads a bounded header (os.pread) of unknown files and matches it against MagicTable.
+    Results are cached on disk by inode/size/mtime, so rescans never re-read unchanged files.
+    Header reads run on a small thread pool.
+    """
+
+    def __init__(self, head_bytes=8192, workers=8):
+        self.head_bytes = max(512, int(head_bytes or 8192))
+        self.workers = max(1, int(workers or 1))
+        self.table = MagicTable()
+        self.cache = JsonStore(sniff_cache_path())
+        self.pool = None
+
+    @staticmethod
+    def _key(ent) -> str:
+        st = entry_stat(ent)
+        return f"{ent.inode() or st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+    def _sniff_one(self, path: str) -> str | None:
+        try:
+            fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        except OSError:
+            return None
+        try:
+            if not hasattr(os, "pread"):
+                return self.table.match(os.read(fd, self.head_bytes))
+            head = os.pread(fd, self.head_bytes, 0)
+            cat = self.table.match(head)
+            if cat is None and len(head) == self.head_bytes:
+                # ISO 9660 descriptor sits at 32 KiB: one tiny extra read, no big header
+                if os.pread(fd, 5, _ISO_OFFSET) == b"CD001":
+                    cat = "Archives"
+            return cat
+        except OSError:
+            return None
+        finally:
+            os.close(fd)
+
+    def sniff_many(self, ents: list) -> list:
+        """Category (or None) per DirEntry, in order."""
+        out = [None] * len(ents)
+        todo = []
+        for i, ent in enumerate(ents):
+            try:
+                key = self._key(ent)
+            except OSError:
+                continue
+            hit = self.cache.get(key)
+            if hit is not None:
+                out[i] = hit or None
+            else:
+                todo.append((i, key, ent.path))
+        if not todo:
+            return out
+        if self.pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        for (i, key, _), cat in zip(todo, self.pool.map(self._sniff_one, [t[2] for t in todo])):
+            out[i] = cat
+            self.cache.put(key, cat or "")
+        return out
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+        self.cache.save()
+
+
+# ----------------------------
+# Duplicate detection (size -> partial hash -> full hash)
+# ----------------------------
+DUP_POLICIES = ("off", "skip", "hardlink", "move")
+DUP_BATCH = 4096  # files held back for dedupe before their moves start
+
+def hash_cache_path() -> Path:
+    return _config_dir() / "hash_cache.json"
+
+class DupFinder:
+    """
+    Finds byte-identical files in tiers, so almost nothing gets read:
+      1. bucket by size (free, from stat)
+      2. BLAKE2b of the first + last block, only for sizes seen twice
+      3. full BLAKE2b (mmap, or readinto a reused buffer), only if step 2 still collides
+    Hashes are cached on disk by dev:inode:size:mtime_ns.
+    """
+
+    def __init__(self, workers=4, block=65536):
+        self.workers = max(1, int(workers or 1))
+        self.block = block
+        self.cache = JsonStore(hash_cache_path())
+        self.local = threading.local()
+
+    def _buf(self, n) -> bytearray:
+        buf = getattr(self.local, "buf", None)
+        if buf is None or len(buf) < n:
+            buf = self.local.buf = bytearray(max(n, 1 << 20))
+        return buf
+
+    def _partial(self, path: str, size: int) -> str:
+        import hashlib
+        h = hashlib.blake2b(digest_size=16)
+        buf = memoryview(self._buf(self.block))[:self.block]
+        with open(path, "rb", buffering=0) as f:
+            n = f.readinto(buf)
+            h.update(buf[:n])
+            if size > 2 * self.block:
+                f.seek(size - self.block)
+                n = f.readinto(buf)
+                h.update(buf[:n])
+            elif size > self.block:
+                n = f.readinto(buf)
+                h.update(buf[:n])
+        return h.hexdigest()
+
+    def _full(self, path: str, size: int) -> str:
+        import hashlib, mmap
+        h = hashlib.blake2b(digest_size=32)
+        with open(path, "rb", buffering=0) as f:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    h.update(m)  # hashlib drops the GIL on big buffers
+                    return h.hexdigest()
+            except (ValueError, OSError):
+                pass  # empty / special file: plain reads
+            buf = self._buf(1 << 20)
+            view = memoryview(buf)
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                h.update(view[:n])
+        return h.hexdigest()
+
+    def _hash(self, job):
+        kind, path, size = job
+        try:
+            return self._partial(path, size) if kind == "p" else self._full(path, size)
+        except OSError:
+            return None
+
+    def _tier(self, pool, files, kind) -> dict:
+        """Group indices by (size, digest) for one tier, using the cache where possible."""
+        out = defaultdict(list)
+        todo = []
+        for i, (path, st) in files:
+            key = f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+            hit = (self.cache.get(key) or {}).get(kind)
+            if hit:
+                out[(st.st_size, hit)].append(i)
+            else:
+                todo.append((i, key, path, st))
+        jobs = [(kind, path, st.st_size) for _, _, path, st in todo]
+        for (i, key, _, st), digest in zip(todo, pool.map(self._hash, jobs)):
+            if digest is None:
+                continue
+            rec = dict(self.cache.get(key) or {})
+            rec[kind] = digest
+            self.cache.put(key, rec)
+            out[(st.st_size, digest)].append(i)
+        return out
+
+    def groups(self, files: list) -> list[list[int]]:
+        """files: [(path, stat_result)]. Returns index groups of identical content (2+ each)."""
+        by_size = defaultdict(list)
+        for i, (path, st) in enumerate(files):
+            if st.st_size > 0:
+                by_size[st.st_size].append(i)
+        cands = [i for lst in by_size.values() if len(lst) > 1 for i in lst]
+        if not cands:
+            return []
+
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            partial = self._tier(pool, [(i, files[i]) for i in cands], "p")
+            out = []
+            full_cands = []
+            for (size, _), idx in partial.items():
+                if len(idx) < 2:
+                    continue
+                if size <= 2 * self.block:
+                    out.append(idx)  # the partial hash already covered every byte
+                else:
+                    full_cands.extend(idx)
+            if full_cands:
+                full = self._tier(pool, [(i, files[i]) for i in full_cands], "f")
+                out.extend(idx for idx in full.values() if len(idx) > 1)
+        self.cache.save()
+        return out
+
+
+# ----------------------------
+# Move journal (undo / resume)
+# ----------------------------
+JOURNAL_BATCH = 256
+
+def journal_path() -> Path:
+    return _config_dir() / "journal.jsonl"
+
+_RUN_SEQ = [0]
+
+def new_run_id() -> str:
+    # unique per process even when runs start within the same second (watch mode, several roots)
+    _RUN_SEQ[0] += 1
+    rid = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+    return rid if _RUN_SEQ[0] == 1 else f"{rid}.{_RUN_SEQ[0]}"
+
+class MoveJournal:
+    """
+    Append-only JSON Lines journal of moves, one record per line:
+
+      {"t":"run",  "run":id, "sort_root":..., "downloads":...}
+      {"t":"plan", "run":id, "i":n, "src":..., "dest":..., "size":..., "mtime":..., "ext":...}
+      {"t":"done", "run":id, "i":n, "dest":...}      (final dest, may differ after a late collision)
+      {"t":"fail", "run":id, "i":n, "err":...}
+      {"t":"end",  "run":id, "moved":..., "skipped":...}
+      {"t":"undo", "run":id, "restored":...}
+
+    Plan records are fsynced before their moves start (one fsync per batch);
+    done/fail records are fsynced every fsync_every records and on close.
+    A run without "end" can be resumed. Old runs are compacted away on open
+    (max_bytes None: never, another process owns compaction).
+    Records are written in whole-line batches (one write() per sync) so several
+    processes can append to the same journal without tearing lines.
+    """
+
+    def __init__(self, run_id=None, fsync_every=256, max_bytes=32 << 20, keep_runs=50):
+        self.run_id = run_id or new_run_id()
+        self.fsync_every = max(1, int(fsync_every))
+        self.pending = []
+        self.seq = 0
+        ensure_dirs(_config_dir())
+        try:
+            if max_bytes is not None and journal_path().stat().st_size > max_bytes:
+                compact_journal(keep_runs)
+        except OSError:
+            pass
+        self.f = open(journal_path(), "ab", buffering=0)
+
+    def _write(self, rec: dict):
+        rec["run"] = self.run_id
+        self.pending.append(json.dumps(rec, ensure_ascii=False) + "\n")
+
+    @property
+    def unsynced(self) -> int:
+        return len(self.pending)
+
+    def sync(self):
+        if self.pending:
+            data = "".join(self.pending).encode("utf-8")
+            self.pending = []
+            self.f.write(data)
+            os.fsync(self.f.fileno())
+
+    def begin(self, **meta):
+        self._write({"t": "run", "v": 2, **meta})  # v2: created folders are journaled ("mkdir")
+        self.sync()
+
+    def planned(self, item: dict):
+        item["i"] = self.seq
+        self.seq += 1
+        self._write({"t": "plan", "i": item["i"], "src": str(item["src"]), "dest": str(item["dest"]),
+                     "size": item.get("size"), "mtime": item.get("mtime"), "ext": item.get("ext")})
+
+    def finished(self, item: dict, err=None):
+        if "i" not in item:
+            return
+        if item.get("made"):
+            self._write({"t": "mkdir", "dirs": item["made"]})
+        if err is None:
+            self._write({"t": "done", "i": item["i"], "dest": str(item["dest"])})
+        else:
+            self._write({"t": "fail", "i": item["i"], "err": str(err)})
+        if self.unsynced >= self.fsync_every:
+            self.sync()
+
+    def end(self, **totals):
+        self._write({"t": "end", **totals})
+        self.sync()
+
+    def close(self):
+        try:
+            self.sync()
+        finally:
+            self.f.close()
+
+def read_journal(paths=None) -> dict:
+    """
+    run_id -> {"meta", "plans": {i: rec}, "done": {i: dest}, "failed": {i: err}, "made": [dir],
+    "end", "undone"} (oldest first)
+    """
+    if paths is None:
+        paths = [journal_path().with_suffix(".jsonl.1"), journal_path()]
+    runs = {}
+    for jp in paths:
+        try:
+            f = open(jp, "r", encoding="utf-8")
+        except OSError:
             continue
-        if is_probably_incomplete(p.name):
+        with f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # torn last line after a crash
+                run = runs.setdefault(rec.get("run"), {"meta": {}, "plans": {}, "done": {}, "failed": {},
+                                                        "made": [], "end": None, "undone": False})
+                t = rec.get("t")
+                if t == "run":
+                    run["meta"] = rec
+                elif t == "plan":
+                    run["plans"][rec["i"]] = rec
+                elif t == "done":
+                    run["done"][rec["i"]] = rec["dest"]
+                elif t == "fail":
+                    run["failed"][rec["i"]] = rec.get("err")
+                elif t == "mkdir":
+                    run["made"].extend(rec.get("dirs") or ())
+                elif t == "end":
+                    run["end"] = rec
+                elif t == "undo":
+                    run["undone"] = True
+                elif t == "move":  # compacted plan+done
+                    run["plans"][rec["i"]] = rec
+                    run["done"][rec["i"]] = rec["dest"]
+    return runs
+
+def compact_journal(keep_runs=50):
+    """
+    Keep the newest keep_runs runs, fold plan+done into one "move" record,
+    drop failures of finished runs. The previous file is kept as journal.jsonl.1.
+    """
+    runs = read_journal([journal_path()])
+    keep = list(runs.items())[-max(1, int(keep_runs)):]
+    tmp = journal_path().with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for run_id, run in keep:
+            out = [dict(run["meta"], run=run_id)] if run["meta"] else []
+            for i, rec in run["plans"].items():
+                if i in run["done"]:
+                    out.append(dict(rec, t="move", dest=run["done"][i], run=run_id))
+                elif run["end"] is None and i not in run["failed"]:
+                    out.append(dict(rec, t="plan", run=run_id))  # still resumable
+            if run["made"]:
+                out.append({"t": "mkdir", "dirs": list(dict.fromkeys(run["made"])), "run": run_id})
+            if run["end"]:
+                out.append(dict(run["end"], run=run_id))
+            if run["undone"]:
+                out.append({"t": "undo", "run": run_id})
+            for rec in out:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(journal_path(), journal_path().with_suffix(".jsonl.1"))
+    os.replace(tmp, journal_path())
+    log(f"[journal] compacted: kept {len(keep)} of {len(runs)} runs")
+
+def _inside(path: str, root: str) -> bool:
+    try:
+        return os.path.commonpath([os.path.abspath(path), os.path.abspath(root)]) == os.path.abspath(root)
+    except ValueError:
+        return False  # other drive
+
+def _pick_run(runs: dict, run_id, want):
+    if run_id and run_id != "last":
+        return run_id, runs.get(run_id)
+    for rid in reversed(list(runs)):
+        if want(runs[rid]):
+            return rid, runs[rid]
+    return None, None
+
+def undo_run(cfg, run_id=None) -> dict:
+    """Move every file of a run back to where it came from (in parallel)."""
+    workers = int(cfg["downloads"].get("move_workers", 4) or 1)
+    runs = read_journal()
+    rid, run = _pick_run(runs, run_id, lambda r: r["done"] and not r["undone"])
+    if run is None:
+        return {"run_id": None, "restored": 0, "skipped": 0}
+
+    restored, skipped = 0, 0
+    todo = []
+    for i, dest in run["done"].items():
+        rec = run["plans"].get(i)
+        if rec is not None:
+            todo.append((rec["src"], dest, rec.get("size")))
+
+    def back(job):
+        import shutil
+        src, dest, size = job
+        if os.path.lexists(src):
+            raise FileExistsError(f"{src} exists again")
+        st = path_stat(dest)
+        if size is not None and st.st_size != size:
+            raise RuntimeError(f"{dest} changed since the move")
+        safe_mkdir(Path(src).parent)
+        shutil.move(dest, src)
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for job, fut in [(j, pool.submit(back, j)) for j in todo]:
+            err = fut.exception()
+            if err is None:
+                restored += 1
+            else:
+                skipped += 1
+                log(f"[undo] skip {job[1]}: {err}")
+
+    # drop folders this run created and has now left empty, deepest first
+    if run["meta"].get("v", 1) >= 2:
+        for d in sorted(set(run["made"]), key=lambda d: d.count(os.sep), reverse=True):
+            try:
+                os.rmdir(d)
+            except OSError:
+                pass  # not empty (or already gone)
+    else:
+        # older journals did not record folders: only empty ones strictly inside sort_root
+        stop = run["meta"].get("sort_root")
+        for d in sorted({str(Path(j[1]).parent) for j in todo}, key=len, reverse=True):
+            while stop and d != stop and _inside(d, stop):
+                try:
+                    os.rmdir(d)
+                except OSError:
+                    break
+                d = os.path.dirname(d)
+
+    with open(journal_path(), "a", encoding="utf-8") as f:
+        f.write(json.dumps({"t": "undo", "run": rid, "restored": restored}) + "\n")
+    log(f"[undo] run={rid} restored={restored} skipped={skipped}")
+    return {"run_id": rid, "restored": restored, "skipped": skipped}
+
+def resume_run(cfg, run_id=None) -> dict:
+    """Finish an interrupted run from its journaled plan (no rescan)."""
+    workers = int(cfg["downloads"].get("move_workers", 4) or 1)
+    runs = read_journal()
+    rid, run = _pick_run(runs, run_id, lambda r: r["end"] is None and r["plans"])
+    if run is None:
+        return {"run_id": None, "moved": 0, "skipped": 0}
+
+    moved, skipped = 0, 0
+    journal = MoveJournal(run_id=rid)
+
+    def on_done(item, err):
+        nonlocal moved, skipped
+        journal.finished(item, err)
+        if err is None:
+            moved += 1
+        else:
+            skipped += 1
+            log(f"[resume] skip {item['src'].name}: {err}")
+
+    executor = MoveExecutor(workers=workers, on_done=on_done, **copy_options(cfg["downloads"]))
+    try:
+        for i, rec in run["plans"].items():
+            if i in run["done"] or i in run["failed"]:
+                continue
+            item = dict(_plan_item(rec), i=i)
+            check = revalidate(rec)
+            if check is True:
+                on_done(item, None)  # moved before the crash, the done record just never hit the disk
+            elif check is not None:
+                on_done(item, check)
+            else:
+                executor.submit(item)
+    finally:
+        executor.close()
+        journal.end(moved=moved, skipped=skipped, resumed=True)
+        journal.close()
+    log(f"[resume] run={rid} moved={moved} skipped={skipped}")
+    return {"run_id": rid, "moved": moved, "skipped": skipped}
+
+
+# ----------------------------
+# Move plans (plan now, apply later)
+# ----------------------------
+PLAN_VERSION = 1
+
+def last_plan_path() -> Path:
+    return _config_dir() / "last_plan.jsonl"
+
+class PlanWriter:
+    """
+    Drop-in for MoveExecutor that writes planned moves as JSON Lines instead of moving.
+    Line 1 is a header, then one {"src","dest","size","mtime","ext"[,"link_to"]} per file.
+    """
+
+    def __init__(self, path: Path, on_done=None, **meta):
+        self.path = Path(path)
+        ensure_dirs(self.path.parent)
+        self.on_done = on_done or (lambda item, err: None)
+        self.f = open(self.path, "w", encoding="utf-8")
+        self.f.write(json.dumps({"plan": PLAN_VERSION, "created": datetime.now().isoformat(timespec="seconds"),
+                                 **meta}, ensure_ascii=False) + "\n")
+
+    def submit(self, item: dict):
+        rec = {"src": str(item["src"]), "dest": str(item["dest"]),
+               "size": item.get("size"), "mtime": item.get("mtime"), "ext": item.get("ext")}
+        if item.get("link_to"):
+            rec["link_to"] = str(item["link_to"])
+        self.f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self.on_done(item, None)
+
+    def cancel(self):
+        pass
+
+    def wait(self):
+        pass
+
+    def close(self):
+        self.f.close()
+
+def read_plan(path: Path):
+    """Yields the header dict first, then one record per planned move."""
+    with open(path, "r", encoding="utf-8") as f:
+        header = json.loads(f.readline() or "{}")
+        if header.get("plan") != PLAN_VERSION:
+            raise ValueError(f"{path} is not a {APP_BASENAME} plan (version {PLAN_VERSION})")
+        yield header
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def revalidate(rec: dict):
+    """
+    Cheap re-check of a planned move (one stat, no re-planning).
+    Returns None to go ahead, True if it already happened, or the reason to refuse.
+    """
+    try:
+        st = path_stat(rec["src"])
+    except OSError:
+        if os.path.lexists(rec["dest"]):
+            return True
+        return FileNotFoundError(f"{rec['src']} is gone")
+    if st.st_size != rec.get("size") or st.st_mtime_ns != rec.get("mtime"):
+        return RuntimeError("changed since it was planned")
+    return None
+
+def _plan_item(rec: dict) -> dict:
+    dest = Path(rec["dest"])
+    item = {"src": Path(rec["src"]), "dest": dest, "dest_dir": dest.parent, "ext": rec.get("ext"),
+            "size": rec.get("size"), "mtime": rec.get("mtime")}
+    if rec.get("link_to"):
+        item["link_to"] = rec["link_to"]
+    return item
+
+def apply_plan(cfg, path=None) -> dict:
+    """Execute a saved plan (from --plan or --dry-run) as a normal journaled run."""
+    dcfg = cfg["downloads"]
+    path = Path(path) if path else last_plan_path()
+    records = read_plan(path)
+    header = next(records)
+
+    moved, skipped = 0, 0
+    journal = MoveJournal() if dcfg.get("journal", True) else None
+    to_submit = []
+
+    def on_done(item, err):
+        nonlocal moved, skipped
+        if journal is not None:
+            journal.finished(item, err)
+        if err is None:
+            moved += 1
+        else:
+            skipped += 1
+            log(f"[apply] skip {item['src'].name}: {err}")
+
+    def flush():
+        for item in to_submit:
+            journal.planned(item)
+        journal.sync()
+        for item in to_submit:
+            executor.submit(item)
+        to_submit.clear()
+
+    executor = MoveExecutor(workers=int(dcfg.get("move_workers", 4) or 1), on_done=on_done, **copy_options(dcfg))
+    if journal is not None:
+        journal.begin(sort_root=header.get("sort_root"), downloads=header.get("downloads"), plan=str(path))
+    ok = False
+    try:
+        for rec in records:
+            item = _plan_item(rec)
+            check = revalidate(rec)
+            if check is True:
+                continue  # already where the plan wants it
+            if check is not None:
+                on_done(item, check)
+                continue
+            if journal is None:
+                executor.submit(item)
+                continue
+            to_submit.append(item)
+            if len(to_submit) >= JOURNAL_BATCH:
+                flush()
+        if journal is not None:
+            flush()
+        ok = True
+    finally:
+        executor.close()
+        if journal is not None:
+            if ok:
+                journal.end(moved=moved, skipped=skipped)
+            journal.close()
+    log(f"[apply] plan={path} moved={moved} skipped={skipped}")
+    return {"plan": str(path), "moved": moved, "skipped": skipped,
+            "run_id": journal.run_id if journal is not None else None}
+
+
+# ----------------------------
+# Move results (streaming sinks)
+# ----------------------------
+class MoveCounter:
+    """
+    Counter-only sink: moved/skipped totals plus moves per destination folder.
+    Sinks get add(item, err) once per finished file (caller's thread) and close() at the end;
+    none of them keeps per-file state, so memory does not grow with the folder.
+    """
+
+    def __init__(self):
+        self.moved = 0
+        self.skipped = 0
+        self.by_dest = defaultdict(int)
+
+    def add(self, item: dict, err):
+        if err is None:
+            self.moved += 1
+            self.by_dest[str(item["dest_dir"])] += 1
+        else:
+            self.skipped += 1
+
+    def summary(self, limit=None) -> list:
+        top = sorted(self.by_dest.items(), key=lambda x: (-x[1], x[0]))
+        return [f"{n} -> {k}" for k, n in top[:limit]]
+
+    def close(self):
+        pass
+
+class RecentMoves:
+    """Ring buffer sink: the last `size` moves as 'name -> dest' lines (for the TUI)."""
+
+    def __init__(self, size=30):
+        self.lines = deque(maxlen=size)
+
+    def add(self, item: dict, err):
+        if err is None:
+            self.lines.append(f"{item['src'].name} -> {item['dest']}")
+
+    def close(self):
+        pass
+
+class MoveLogSink:
+    """JSON Lines sink: one {"src","dest"[,"link_to"]} or {"src","error"} per file."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        ensure_dirs(self.path.parent)
+        self.f = open(self.path, "a", encoding="utf-8", buffering=1 << 16)
+
+    def add(self, item: dict, err):
+        rec = {"src": str(item["src"])}
+        if err is None:
+            rec["dest"] = str(item["dest"])
+            if item.get("link_to"):
+                rec["link_to"] = str(item["link_to"])
+        else:
+            rec["error"] = str(err)
+        self.f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self.f.close()
+
+class Progress:
+    """
+    Live counters of a running sort, safe to read from another thread (the TUI).
+    The total is counted while the scan runs (found()) and fixed once it is over (scanned()).
+    snapshot(): done/found/total files, bytes, files/s, bytes/s and an ETA once the total is known.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.total = None
+        self.seen = 0
+        self.done = 0
+        self.bytes = 0
+        self.t0 = time.monotonic()
+
+    def start(self):
+        with self.lock:
+            self.t0 = time.monotonic()
+
+    def found(self):
+        with self.lock:
+            self.seen += 1
+
+    def scanned(self):
+        with self.lock:
+            self.total = self.seen
+
+    def add(self, item: dict, err):
+        with self.lock:
+            self.done += 1
+            if err is None:
+                self.bytes += item.get("size") or 0
+
+    def skip(self):
+        """A file the rules or dedupe left where it is: done, nothing moved."""
+        with self.lock:
+            self.done += 1
+
+    def close(self):
+        pass
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            done, seen, total, nbytes = self.done, self.seen, self.total, self.bytes
+        secs = max(time.monotonic() - self.t0, 1e-6)
+        rate = done / secs
+        eta = (total - done) / rate if total is not None and done and total >= done else None
+        return {"done": done, "found": seen, "total": total, "bytes": nbytes, "secs": secs,
+                "files_per_s": rate, "bytes_per_s": nbytes / secs, "eta_s": eta}
+
+
+# ----------------------------
+# Sort run
+# ----------------------------
+class _PathEntry:
+    """Minimal os.DirEntry stand-in for names we already know (watch mode)."""
+
+    __slots__ = ("name", "path", "_st")
+
+    def __init__(self, folder: Path, name: str):
+        self.name = name
+        self.path = os.path.join(str(folder), name)
+        self._st = None
+
+    def stat(self, follow_symlinks=True):
+        if not follow_symlinks:
+            return os.lstat(self.path)
+        if self._st is None:
+            self._st = os.stat(self.path)
+        return self._st
+
+    def inode(self):
+        return self.stat().st_ino
+
+    def is_dir(self, follow_symlinks=True):
+        return os.path.isdir(self.path)
+
+    def is_file(self, follow_symlinks=True):
+        return os.path.isfile(self.path)
+
+    def is_symlink(self):
+        return os.path.islink(self.path)
+
+def _entries_for(folder: Path, names):
+    for n in names:
+        ent = _PathEntry(folder, n)
+        try:
+            if ent.is_file():
+                yield ent
+        except OSError:
             continue
 
-        ext = p.suffix.lower()
-        cat = ext_to_cat.get(ext)
+def sort_downloads(cfg, only=None, include_incomplete=(), plan_out=None, profile=False, sinks=(),
+                   progress=None, cancel=None) -> dict:
+    """
+    progress: a Progress, fed every file the scan finds and every result (moves and skips).
+    cancel: threading.Event; once set, nothing new is planned, queued copies are dropped,
+    moves already running finish, and the journal gets a normal "end" (cancelled=true).
+    sinks: extra move sinks (RecentMoves, MoveLogSink, ...); totals and the per-folder
+    summary are always counted. result["moves"] is the first RecentMoves' lines, else [].
+    only: just these names in the Downloads root (watch mode), no listing.
+    include_incomplete: names to sort even though they look like partial downloads.
+    plan_out: write the move plan there instead of moving (dry-run: last_plan.jsonl).
+    profile: collect phase timers/counters (result["profile"] + one [profile] log line).
+    """
+    prof = RunProfile() if profile else None
+    dcfg = cfg["downloads"]
+    downloads = expand_path(dcfg["path"])
+    if not downloads.exists():
+        raise FileNotFoundError(f"Downloads not found: {downloads}")  # before any plan/journal file is opened
+    sr = (dcfg.get("sort_root", "") or "").strip()
+    sort_root = expand_path(sr) if sr else downloads
+
+    dry_run = bool(dcfg.get("dry_run", False))
+    unknown_folder = dcfg.get("unknown_folder", "_Other")
+    ignore_hidden = bool(dcfg.get("ignore_hidden", True))
+    ignore_names = set((n or "").lower() for n in dcfg.get("ignore_names", []))
+    recursive = bool(dcfg.get("recursive", False))
+    move_workers = int(dcfg.get("move_workers", 4) or 1)
+    max_depth = int(dcfg.get("max_depth", 3) or 0)
+    group_sets = bool(dcfg.get("group_archive_sets", False))
+
+    clf = compile_classifier(cfg)
+    cat_meta = clf.cat_meta
+    rules = compile_rules(dcfg)
+    now = time.time()
+
+    # Never walk into what we create (or into sort_root itself if it lives inside Downloads).
+    skip_dirs = [sort_root / m["folder"] for m in cat_meta.values()]
+    skip_dirs.append(sort_root / unknown_folder)
+    skip_dirs.append(sort_root / dcfg.get("duplicates_folder", "_Duplicates"))
+    if rules is not None:
+        skip_dirs += [sort_root / r.folder for r in rules.rules if r.folder]
+    if sort_root != downloads:
+        skip_dirs.append(sort_root)
+    for x in dcfg.get("exclude_dirs", []) or []:
+        xp = Path(os.path.expandvars(os.path.expanduser(x)))
+        skip_dirs.append(xp if xp.is_absolute() else downloads / xp)
+
+    counter = MoveCounter()
+    sinks = [counter, *sinks] + ([progress] if progress is not None else [])
+    index = NameIndex()
+
+    dup_policy = str(dcfg.get("duplicates", "off") or "off").lower()
+    if dup_policy not in DUP_POLICIES:
+        raise ValueError(f"duplicates must be one of {', '.join(DUP_POLICIES)}")
+    dup_folder = dcfg.get("duplicates_folder", "_Duplicates")
+    dupes = DupFinder(workers=move_workers) if dup_policy != "off" else None
+    dup_items = []
+    dup_seen = defaultdict(list)  # size -> [(src, dest, stat)] kept by earlier dedupe batches
+    duplicates = 0
+
+    if dry_run and plan_out is None:
+        plan_out = last_plan_path()  # dry-run output can be applied later with --apply
+    journal = None
+    if plan_out is None and dcfg.get("journal", True):
+        jmb = dcfg.get("journal_max_mb", 32)
+        journal = MoveJournal(fsync_every=dcfg.get("journal_fsync_every", 256),
+                              max_bytes=None if jmb is None else int(float(jmb) * (1 << 20)),
+                              keep_runs=dcfg.get("journal_keep_runs", 50))
+    to_submit = []
+
+    def on_done(item, err):
+        if journal is not None:
+            journal.finished(item, err)
+        for sink in sinks:
+            sink.add(item, err)
+        if err is None:
+            if prof is not None:
+                if plan_out is None:
+                    prof.bytes_moved += item.get("size") or 0
+                else:
+                    prof.bytes_planned += item.get("size") or 0  # PlanWriter: written down, not moved
+        else:
+            log(f"[sort] skip {item['src'].name}: {err}")
 
+    if plan_out is not None:
+        executor = PlanWriter(plan_out, on_done=on_done, sort_root=str(sort_root), downloads=str(downloads))
+    else:
+        executor = MoveExecutor(workers=move_workers, on_done=on_done, index=index, prof=prof,
+                                **copy_options(dcfg))
+    sniffer = None
+    if dcfg.get("sniff_content", False):
+        sniffer = ContentSniffer(dcfg.get("sniff_bytes", 8192), dcfg.get("sniff_workers", 8))
+    sniff_batch = []
+    need_stat = journal is not None or dup_policy != "off" or plan_out is not None or prof is not None
+
+    def plan(ent, p, ext, cat, volume=False):
         if cat:
             folder = cat_meta.get(cat, {}).get("folder", cat)
             by_date = bool(cat_meta.get(cat, {}).get("by_date", False))
         else:
             folder = unknown_folder
             by_date = False
+        # a file can vanish (or be a dangling symlink) between listing and stat:
+        # that is a per-file skip, not the end of the run
+        st = None
+        try:
+            if rules is not None:
+                rule = rules.match(ent, p.name, ext, cat, now)
+                if rule is not None:
+                    if rule.skip:
+                        if progress is not None:
+                            progress.skip()
+                        return
+                    folder = rule.folder  # absolute = outside sort_root (e.g. a bulk volume)
+                    if rule.by_date is not None:
+                        by_date = bool(rule.by_date)
+            if by_date or need_stat:
+                t = time.perf_counter()
+                st = entry_stat(ent)
+                if prof is not None:
+                    prof.add("stat", time.perf_counter() - t)
+        except OSError as e:
+            on_done({"src": p}, e)
+            return
 
         dest_dir = sort_root / folder
-        if by_date:
-            dt = datetime.fromtimestamp(p.stat().st_mtime)
+        if group_sets and not volume and ext in SET_HEADS:
+            # the head goes with its .rNN/.zNN parts
+            volume = is_set_head(p, ext, dest_dir / (p.name[:-len(ext)].rstrip(". ") or p.name))
+        if volume and group_sets:
+            # all parts of movie.part01.rar / movie.7z.001 / movie.r00 land together
+            base = p.name[:-len(ext)].rstrip(". ") or p.name
+            dest_dir = dest_dir / base
+        elif by_date:
+            dt = datetime.fromtimestamp(st.st_mtime)
             dest_dir = dest_dir / f"{dt:%Y}" / f"{dt:%m}"
 
-        dest = unique_path(dest_dir / p.name)
-
+        t = time.perf_counter()
         try:
-            safe_mkdir(dest_dir, dry=dry_run)
-            if not dry_run:
-                shutil.move(str(p), str(dest))
-            moved += 1
-            moves.append(f"{p.name} -> {dest}")
-            counts[str(dest_dir)] += 1
+            dest = index.claim(dest_dir / p.name, ext=ext)
         except Exception as e:
-            skipped += 1
-            log(f"[sort] skip {p.name}: {e}")
-
-    summary = [f"{n} -> {k}" for k, n in sorted(counts.items(), key=lambda x: (-x[1], x[0]))]
-    log(f"[sort] moved={moved} skipped={skipped} sort_root={sort_root} ext_db={len(ext_to_cat)}")
+            on_done({"src": p}, e)
+            return
+        if prof is not None:
+            prof.add("collision", time.perf_counter() - t)
+        item = {"src": p, "dest": dest, "dest_dir": dest_dir, "ext": ext}
+        if need_stat:
+            item["size"], item["mtime"] = st.st_size, st.st_mtime_ns
+            if dup_policy != "off":
+                item["stat"] = st
+                dup_items.append(item)  # decided per batch in flush_dupes()
+                if len(dup_items) >= DUP_BATCH:
+                    flush_dupes()
+                return
+        dispatch(item)
+
+    def dispatch(item):
+        if journal is None:
+            executor.submit(item)
+            return
+        to_submit.append(item)
+        if len(to_submit) >= JOURNAL_BATCH:
+            flush_planned()
+
+    def flush_dupes():
+        nonlocal duplicates
+        if not dup_items:
+            return
+        t = time.perf_counter()
+        files = [(str(it["src"]), it["stat"]) for it in dup_items]
+        n_in = len(files)
+        sizes = {st.st_size for _, st in files}
+        keepers = {}  # index in files -> where that file ends up
+        # files kept by earlier batches: let their moves land first, then hash them where they are
+        earlier = [k for size in sizes for k in dup_seen.get(size, ())]
+        if earlier:
+            if journal is not None:
+                flush_planned()
+            executor.wait()
+            for src, dest, st in earlier:
+                keepers[len(files)] = dest
+                files.append((dest if os.path.exists(dest) else src, st))
+        listed = {path for path, _ in files}
+        # what is already sorted counts too: "invoice.pdf" again is a duplicate of Documents/invoice.pdf
+        for d in {str(it["dest_dir"]) for it in dup_items}:
+            try:
+                with os.scandir(d) as it:
+                    for e in it:
+                        if e.is_file(follow_symlinks=False) and e.path not in listed:
+                            st = e.stat(follow_symlinks=False)
+                            if st.st_size in sizes:
+                                files.append((e.path, st))
+            except OSError:
+                continue
+
+        dup_of = {}
+        for grp in dupes.groups(files):
+            incoming = [i for i in grp if i < n_in]
+            existing = [i for i in grp if i >= n_in]
+            k = existing[0] if existing else incoming[0]
+            keeper = keepers.get(k, files[k][0])
+            for i in (incoming if existing else incoming[1:]):
+                dup_of[i] = keeper
+        if prof is not None:
+            prof.add("dedupe", time.perf_counter() - t, len(dup_items))
+
+        for i, it in enumerate(dup_items):
+            keeper = dup_of.get(i)
+            if keeper is None:
+                continue
+            duplicates += 1
+            if dup_policy == "skip":
+                index.release(it["dest"])
+                log(f"[dupe] left {it['src'].name} (same as {keeper})")
+                if progress is not None:
+                    progress.skip()
+                continue
+            if dup_policy == "move":
+                index.release(it["dest"])
+                it["dest_dir"] = sort_root / dup_folder
+                it["dest"] = index.claim(it["dest_dir"] / it["src"].name, ext=it["ext"])
+            else:
+                it["link_to"] = keeper
+            dispatch(it)  # duplicates first: hard links must see the keeper before it moves
+        for i, it in enumerate(dup_items):
+            if i not in dup_of:
+                if it["size"] > 0:
+                    dup_seen[it["size"]].append((str(it["src"]), str(it["dest"]), it["stat"]))
+                dispatch(it)
+        dup_items.clear()
+
+    def flush_planned():
+        # write-ahead: plan records hit the disk (one fsync) before any of these moves start
+        t = time.perf_counter()
+        for item in to_submit:
+            journal.planned(item)
+        journal.sync()
+        if prof is not None:
+            prof.add("journal", time.perf_counter() - t, len(to_submit))
+        for item in to_submit:
+            if cancel is not None and cancel.is_set():
+                on_done(item, RuntimeError("cancelled"))  # journaled as failed: nothing left to resume
+            else:
+                executor.submit(item)
+        to_submit.clear()
+
+    def flush_sniffed():
+        if not sniff_batch:
+            return
+        t = time.perf_counter()
+        cats = sniffer.sniff_many([b[0] for b in sniff_batch])
+        if prof is not None:
+            prof.add("sniff", time.perf_counter() - t, len(sniff_batch))
+        for (ent, p, ext), cat in zip(sniff_batch, cats):
+            plan(ent, p, ext, cat)
+        sniff_batch.clear()
+
+    # Safe mode: only root files, unless "recursive" is on.
+    def wanted(name):
+        if ignore_hidden and name.startswith("."):
+            return False
+        if name.lower() in ignore_names:
+            return False
+        return not is_probably_incomplete(name) or name in include_incomplete
+
+    def listing():
+        if only is not None:
+            return _entries_for(downloads, only)
+        return scan_files(downloads, recursive=recursive, max_depth=max_depth,
+                          skip_dirs=skip_dirs, ignore_hidden=ignore_hidden)
+
+    if progress is not None:
+        progress.start()
+    entries = listing()
+    if prof is not None:
+        entries = _timed_entries(entries, prof)
+    if journal is not None:
+        journal.begin(sort_root=str(sort_root), downloads=str(downloads))
+    ok = False
+    cancelled = False
+    try:
+        for ent in entries:
+            if cancel is not None and cancel.is_set():
+                cancelled = True
+                break
+            if not wanted(ent.name):
+                continue
+            if progress is not None:
+                progress.found()
+            p = Path(ent.path)
+
+            if prof is not None:
+                t = time.perf_counter()
+                ext, cat, volume = clf.classify(p.name)
+                prof.add("classify", time.perf_counter() - t)
+            else:
+                ext, cat, volume = clf.classify(p.name)
+            if cat is None and sniffer is not None:
+                sniff_batch.append((ent, p, ext))
+                if len(sniff_batch) >= SNIFF_BATCH:
+                    flush_sniffed()
+                continue
+            plan(ent, p, ext, cat, volume)
+        if not cancelled:
+            if progress is not None:
+                progress.scanned()
+            flush_sniffed()
+            flush_dupes()
+            if journal is not None:
+                flush_planned()
+        # cancelled: batched items were never journaled or queued, so they just stay put
+        ok = True
+    finally:
+        if cancelled:
+            executor.cancel()
+        executor.close()
+        if sniffer is not None:
+            sniffer.close()
+        if journal is not None:
+            if ok:  # no "end" record = resumable with --resume
+                if cancelled:
+                    journal.end(moved=counter.moved, skipped=counter.skipped, cancelled=True)
+                else:
+                    journal.end(moved=counter.moved, skipped=counter.skipped)
+            journal.close()
+        for sink in sinks:
+            sink.close()
+
+    moved, skipped = counter.moved, counter.skipped
+    recent = next((x for x in sinks if isinstance(x, RecentMoves)), None)
+    if dupes is not None:
+        log(f"[dupe] found={duplicates} policy={dup_policy}")
+    if cancelled:
+        log("[sort] cancelled by user")
+    log(f"[sort] moved={moved} skipped={skipped} sort_root={sort_root} ext_db={len(clf)}")
+    if prof is not None:
+        prof.finish()
+        log(f"[profile] {prof.summary()}")
     return {
         "moved": moved,
         "skipped": skipped,
-        "moves": moves,
-        "summary": summary,
+        "duplicates": duplicates,
+        "moves": list(recent.lines) if recent is not None else [],
+        "summary": counter.summary(),
+        "by_dest": dict(counter.by_dest),
         "sort_root": str(sort_root),
-        "ext_db_size": len(ext_to_cat),
+        "ext_db_size": len(clf),
+        "run_id": journal.run_id if journal is not None else None,
+        "plan": str(plan_out) if plan_out is not None else None,
+        "profile": prof.report() if prof is not None else None,
+        "cancelled": cancelled,
     }
 
 
+# ----------------------------
+# Multi-root sort (process pool)
+# ----------------------------
+_ROOT_KEYS = ("moved", "skipped", "duplicates", "by_dest", "sort_root", "run_id", "plan", "profile")
+
+def root_configs(cfg) -> list:
+    """One config per downloads.roots entry (defaults + overrides); just downloads.path if empty."""
+    dcfg = cfg["downloads"]
+    out = []
+    for r in dcfg.get("roots") or []:
+        over = {"path": r} if isinstance(r, str) else dict(r)
+        if not over.get("path"):
+            raise ValueError(f"roots entry without a path: {r!r}")
+        out.append({**cfg, "downloads": {**dcfg, **over, "roots": []}})
+    return out or [{**cfg, "downloads": dict(dcfg)}]
+
+def _root_worker_init(snapshots, dcfg):
+    # worker process: take the parent's compiled classifiers instead of building them again
+    for snap in snapshots:
+        _CLASSIFIERS[snap["key"]] = ExtClassifier(snap["ext_to_cat"], snap["cat_meta"], snap.get("split_cat"))
+    configure_logging(dcfg)
+    _log_writer().max_bytes = 0  # the parent rotates; several rotating writers would race
+
+def _sort_root_group(jobs, profile=False) -> list:
+    """Sorts roots that share a disk one after another. jobs: [(cfg, plan_out)]."""
+    out = []
+    for rcfg, plan_out in jobs:
+        path = rcfg["downloads"]["path"]
+        try:
+            res = sort_downloads(rcfg, plan_out=plan_out, profile=profile)
+            out.append({"path": path, "error": None, **{k: res[k] for k in _ROOT_KEYS}})
+        except Exception as e:
+            log(f"[roots] {path}: {e}")
+            out.append({"path": path, "error": str(e)})
+    if _LOG:
+        _LOG[0].flush()
+    return out
+
+def sort_roots(cfg, plan_out=None, profile=False) -> dict:
+    """
+    Sorts every root from root_configs(). One worker process per source device,
+    roots on the same device run in turn inside it. The classifier is compiled
+    once here and passed to the workers; the journal is compacted here only.
+    plan_out / dry_run with several roots: one plan per root (<stem>.<n><suffix>).
+    """
+    dcfg = cfg["downloads"]
+    roots = root_configs(cfg)
+
+    groups = {}
+    snapshots = {}
+    for i, rcfg in enumerate(roots):
+        rd = rcfg["downloads"]
+        po = plan_out
+        if len(roots) > 1 and (po is not None or rd.get("dry_run")):
+            base = Path(po) if po is not None else last_plan_path()
+            po = base.with_name(f"{base.stem}.{i}{base.suffix}")
+        groups.setdefault(_device_of(expand_path(rd["path"])), []).append((rcfg, po))
+        key = _classifier_key(rd)
+        if key not in snapshots:
+            snapshots[key] = compile_classifier(rcfg).to_json(key)
+    groups = list(groups.values())
+    limit = int(dcfg.get("root_workers", 0) or 0) or len(groups)
+    workers = max(1, min(limit, len(groups)))  # I/O bound: devices, not CPUs, set the width
+
+    results = []
+    if workers == 1:
+        for jobs in groups:
+            results += _sort_root_group(jobs, profile)
+    else:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        if dcfg.get("journal", True):
+            jmb = dcfg.get("journal_max_mb", 32)
+            try:
+                if jmb is not None and journal_path().stat().st_size > float(jmb) * (1 << 20):
+                    compact_journal(dcfg.get("journal_keep_runs", 50))
+            except OSError:
+                pass
+            for jobs in groups:
+                for rcfg, _ in jobs:
+                    rcfg["downloads"]["journal_max_mb"] = None  # workers share the file: no compaction there
+        _log_writer().flush()
+        # spawn everywhere: no fork() of a threaded process, and the same behaviour as on Windows
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_root_worker_init,
+                                 initargs=(list(snapshots.values()), dcfg)) as pool:
+            futs = [(pool.submit(_sort_root_group, jobs, profile), jobs) for jobs in groups]
+            for fut, jobs in futs:
+                try:
+                    results += fut.result()
+                except Exception as e:  # worker died (BrokenProcessPool, pickling ...)
+                    results += [{"path": r["downloads"]["path"], "error": f"worker failed: {e}"} for r, _ in jobs]
+
+    total = MoveCounter()
+    duplicates = 0
+    for r in results:
+        if r["error"] is None:
+            total.moved += r["moved"]
+            total.skipped += r["skipped"]
+            duplicates += r["duplicates"]
+            for k, n in r["by_dest"].items():
+                total.by_dest[k] += n
+    errors = {r["path"]: r["error"] for r in results if r["error"]}
+    log(f"[roots] roots={len(roots)} workers={workers} moved={total.moved} skipped={total.skipped} errors={len(errors)}")
+    return {
+        "moved": total.moved,
+        "skipped": total.skipped,
+        "duplicates": duplicates,
+        "summary": total.summary(),
+        "roots": results,
+        "errors": errors,
+        "workers": workers,
+    }
+
+
+# ----------------------------
+# Watch mode (--watch)
+# ----------------------------
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_ALL = None  # "rescan everything" (queue overflow, first run)
+
+class InotifyWatcher:
+    """Linux inotify through ctypes (stdlib only). wait() returns changed names."""
+
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self, folder: Path):
+        import ctypes
+        libc = _libc()
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(str(folder)), self.MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch failed for {folder}")
+
+    def wait(self, timeout: float):
+        import select, struct
+        r, _, _ = select.select([self.fd], [], [], max(0.0, timeout))
+        if not r:
+            return set()
+        names = set()
+        while True:
+            try:
+                buf = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return names
+            off = 0
+            while off + 16 <= len(buf):
+                _, mask, _, ln = struct.unpack_from("iIII", buf, off)
+                raw = buf[off + 16: off + 16 + ln].rstrip(b"\0")
+                off += 16 + ln
+                if mask & IN_Q_OVERFLOW:
+                    return WATCH_ALL
+                if raw and not mask & IN_ISDIR:
+                    names.add(os.fsdecode(raw))
+
+    def close(self):
+        os.close(self.fd)
+
+class PollWatcher:
+    """Fallback: watch the folder mtime, diff the listing only when it changed."""
+
+    def __init__(self, folder: Path, interval=1.0):
+        self.folder = str(folder)
+        self.interval = max(0.1, float(interval))
+        self.mtime = None
+        self.seen = {}
+
+    def _listing(self) -> dict:
+        out = {}
+        try:
+            with os.scandir(self.folder) as it:
+                for e in it:
+                    try:
+                        if e.is_file():
+                            st = e.stat()
+                            out[e.name] = (st.st_size, st.st_mtime_ns)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return out
+
+    def wait(self, timeout: float):
+        time.sleep(min(max(0.0, timeout), self.interval))
+        try:
+            mtime = os.stat(self.folder).st_mtime_ns
+        except OSError:
+            return set()
+        if mtime == self.mtime:
+            return set()
+        self.mtime = mtime
+        cur = self._listing()
+        changed = {n for n, sig in cur.items() if self.seen.get(n) != sig}
+        self.seen = cur
+        return changed
+
+    def close(self):
+        pass
+
+def _make_watcher(folder: Path, poll_s: float):
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(folder)
+        except (OSError, AttributeError) as e:
+            log(f"[watch] inotify unavailable, polling: {e}")
+    return PollWatcher(folder, poll_s)
+
+def _stop_on_sigterm(stop):
+    """SIGTERM sets stop instead of exiting (main thread only); returns a callable that restores the old handler."""
+    import signal
+    try:
+        prev = signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    except (ValueError, AttributeError):
+        return lambda: None
+    return lambda: signal.signal(signal.SIGTERM, prev)
+
+def watch_downloads(cfg, stop=None):
+    """
+    Sort new downloads as they settle.
+
+    - Events are coalesced per name; a name is handled once nothing touched it
+      for watch_debounce_s (file mtime included, so slow writers are not cut off).
+    - Incomplete downloads (.crdownload/.part/.tmp) wait for the browser's rename,
+      or are sorted anyway after watch_incomplete_quiet_s without changes.
+    - Only the root of Downloads is watched.
+    - stop (threading.Event) ends it; SIGTERM sets it. A batch in progress is cancelled
+      like in the TUI: running moves finish and its journal run gets a normal end.
+    """
+    dcfg = cfg["downloads"]
+    downloads = expand_path(dcfg["path"])
+    debounce = float(dcfg.get("watch_debounce_s", 0.5))
+    quiet = float(dcfg.get("watch_incomplete_quiet_s", 300))
+    if not downloads.exists():
+        raise FileNotFoundError(f"Downloads not found: {downloads}")
+
+    if stop is None:
+        stop = threading.Event()
+    restore = _stop_on_sigterm(stop)
+    watcher = _make_watcher(downloads, float(dcfg.get("watch_poll_s", 1.0)))
+    log(f"[watch] start {downloads} ({type(watcher).__name__})")
+    pending = {}  # name -> last event (monotonic)
+    total = 0
+    try:
+        res = sort_downloads(cfg, cancel=stop)  # catch up on what arrived while we were not running
+        total += res["moved"]
+        while not stop.is_set():
+            changed = watcher.wait(debounce if pending else 1.0)
+            if stop.is_set():
+                break
+            now = time.monotonic()
+            if changed is WATCH_ALL:
+                res = sort_downloads(cfg, cancel=stop)
+                total += res["moved"]
+                pending.clear()
+                continue
+            for name in changed:
+                pending[name] = now
+
+            ready, late = [], []
+            wall = time.time()
+            for name, seen in list(pending.items()):
+                if now - seen < debounce:
+                    continue
+                try:
+                    st = os.stat(downloads / name)
+                except OSError:
+                    pending.pop(name)  # renamed away / deleted
+                    continue
+                idle = wall - st.st_mtime
+                if is_probably_incomplete(name):
+                    if idle >= quiet:
+                        late.append(name)
+                        pending.pop(name)
+                elif idle >= debounce:
+                    ready.append(name)
+                    pending.pop(name)
+            if ready or late:
+                res = sort_downloads(cfg, only=ready + late, include_incomplete=late, cancel=stop)
+                total += res["moved"]
+    except KeyboardInterrupt:
+        pass
+    finally:
+        restore()
+        watcher.close()
+        log(f"[watch] stop moved={total}")
+    return total
+
+
 # ----------------------------
 # Terminal UI (no curses)
 # ----------------------------
@@ -420,14 +3031,99 @@ ANSI = {
     "bold": "\x1b[1m",
 }
 
+_ANSI_ON = []
+
 def ansi_enable_windows():
-    if os.name == "nt":
-        os.system("")
+    if os.name == "nt" and not _ANSI_ON:
+        os.system("")  # once: turns on VT processing for this console
+        _ANSI_ON.append(True)
+
+def fmt_bytes(n: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TiB"
+
+def fit_line(line: str, width: int) -> str:
+    """Cut line to width terminal columns; ANSI sequences take none, wide (CJK) chars two."""
+    import unicodedata
+    out = []
+    cols = 0
+    styled = False
+    i, n = 0, len(line)
+    while i < n:
+        ch = line[i]
+        if ch == "\x1b":
+            j = i + 1
+            if j < n and line[j] == "[":
+                j += 1
+                while j < n and not ("@" <= line[j] <= "~"):
+                    j += 1
+            out.append(line[i:j + 1])
+            styled = True
+            i = j + 1
+            continue
+        w = 2 if unicodedata.east_asian_width(ch) in ("W", "F") else 0 if unicodedata.combining(ch) else 1
+        if cols + w > width:
+            return "".join(out) + (ANSI["norm"] if styled else "")
+        out.append(ch)
+        cols += w
+        i += 1
+    return line
+
+class Screen:
+    """
+    Differential redraw: remembers what is on the terminal and re-emits only the
+    lines that changed (cursor-addressed, erase to end of line). Full clear on the
+    first frame, after invalidate() (anything else that wrote to the screen) and
+    when the terminal was resized. Lines are cut to the terminal size, so nothing wraps or scrolls.
+    """
 
-def term_get_key():
-    # Returns: 'UP','DOWN','ENTER','ESC'
+    def __init__(self):
+        self.lines = None
+        self.size = None
+
+    def invalidate(self):
+        self.lines = None
+
+    def render(self, lines: list):
+        import shutil
+        ansi_enable_windows()
+        size = shutil.get_terminal_size()
+        if size != self.size:
+            self.size = size
+            self.lines = None
+        # one column spare: a line that ends in the last column leaves the cursor in a pending wrap
+        width = max(size.columns - 1, 1)
+        lines = [fit_line(line, width) for line in lines[:max(size.lines, 1)]]
+        out = []
+        old = self.lines
+        if old is None:
+            out.append(ANSI["clear"])
+            old = []
+        for i, line in enumerate(lines):
+            if i >= len(old) or old[i] != line:
+                out.append(f"\x1b[{i + 1};1H{line}\x1b[K")
+        if len(lines) < len(old):
+            out.append(f"\x1b[{len(lines) + 1};1H\x1b[J")
+        if out:
+            sys.stdout.write("".join(out))
+            sys.stdout.flush()
+        self.lines = list(lines)
+
+SCREEN = Screen()
+
+def term_get_key(timeout=None):
+    # Returns: 'UP','DOWN','ENTER','ESC', or None when nothing was pressed within timeout
     if os.name == "nt":
         import msvcrt
+        if timeout is not None:
+            end = time.monotonic() + timeout
+            while not msvcrt.kbhit():
+                if time.monotonic() >= end:
+                    return None
+                time.sleep(0.02)
         ch = msvcrt.getch()
         if ch in (b"\x00", b"\xe0"):
             ch2 = msvcrt.getch()
@@ -438,65 +3134,86 @@ def term_get_key():
             return "ESC"
         return "ESC"
     else:
-        import termios, tty
+        import termios, tty, select
         fd = sys.stdin.fileno()
         old = termios.tcgetattr(fd)
         try:
             tty.setraw(fd)
-            ch = sys.stdin.read(1)
-            if ch == "\x1b":
-                nxt = sys.stdin.read(1)
-                if nxt == "[":
-                    code = sys.stdin.read(1)
-                    return {"A": "UP", "B": "DOWN"}.get(code, "ESC")
+            if timeout is not None and not select.select([fd], [], [], timeout)[0]:
+                return None
+            # os.read, not sys.stdin: nothing may sit in a Python buffer that select() can't see
+            ch = os.read(fd, 1)
+            if ch == b"\x1b":
+                if not select.select([fd], [], [], 0.05)[0]:
+                    return "ESC"  # a lone Esc, not the start of an arrow key
+                nxt = os.read(fd, 1)
+                if nxt == b"[":
+                    code = os.read(fd, 1)
+                    return {b"A": "UP", b"B": "DOWN"}.get(code, "ESC")
                 return "ESC"
-            if ch in ("\r", "\n"):
+            if ch in (b"\r", b"\n"):
                 return "ENTER"
             return "ESC"
         finally:
             termios.tcsetattr(fd, termios.TCSADRAIN, old)
 
-def draw_menu(title, items, idx, ext_db_size=None):
-    ansi_enable_windows()
-    sys.stdout.write(ANSI["clear"])
-    sys.stdout.write(banner() + "\n\n")
-
-    sys.stdout.write(ANSI["bold"] + title + ANSI["norm"] + "\n")
-    sys.stdout.write(ANSI["dim"] + ("─" * max(26, len(title))) + ANSI["norm"] + "\n")
-    sys.stdout.write(ANSI["dim"] + f"Status: {SESSION.get('status','')}" + ANSI["norm"] + "\n")
+def progress_text(snap: dict) -> str:
+    if snap["total"] is not None:
+        total = f"/{snap['total']}"
+    else:
+        total = f"/{snap['found']}+" if snap["found"] else ""  # still scanning
+    eta = ""
+    if snap["eta_s"] is not None:
+        eta = f", ETA {int(snap['eta_s']) // 60}:{int(snap['eta_s']) % 60:02d}"
+    return (f"{snap['done']}{total} files, {snap['files_per_s']:.1f} files/s, "
+            f"{fmt_bytes(snap['bytes'])} ({fmt_bytes(snap['bytes_per_s'])}/s){eta}")
+
+def menu_lines(title, items, idx, ext_db_size=None) -> list:
+    lines = banner().split("\n") + [""]
+    lines.append(ANSI["bold"] + title + ANSI["norm"])
+    lines.append(ANSI["dim"] + ("─" * max(26, len(title))) + ANSI["norm"])
+    status = SESSION.get("status", "")
+    if SESSION.get("progress") is not None:
+        status += " " + progress_text(SESSION["progress"].snapshot())
+    lines.append(ANSI["dim"] + f"Status: {status}" + ANSI["norm"])
     if ext_db_size is not None:
-        sys.stdout.write(ANSI["dim"] + f"Extension DB: {ext_db_size} mapped extensions" + ANSI["norm"] + "\n")
-    sys.stdout.write("\n")
+        lines.append(ANSI["dim"] + f"Extension DB: {ext_db_size} mapped extensions" + ANSI["norm"])
+    lines.append("")
 
     for i, it in enumerate(items):
         line = f"  {it}"
-        if i == idx:
-            sys.stdout.write(ANSI["rev"] + line + ANSI["norm"] + "\n")
-        else:
-            sys.stdout.write(line + "\n")
-
-    sys.stdout.write("\n")
+        lines.append(ANSI["rev"] + line + ANSI["norm"] if i == idx else line)
+    lines.append("")
 
     if SESSION.get("move_summary"):
-        sys.stdout.write(ANSI["dim"] + "Moved this run (summary):" + ANSI["norm"] + "\n")
-        for line in SESSION["move_summary"][-8:]:
-            sys.stdout.write(f"  {line}\n")
-        sys.stdout.write("\n")
+        lines.append(ANSI["dim"] + "Moved this run (summary):" + ANSI["norm"])
+        lines += [f"  {line}" for line in SESSION["move_summary"][-8:]]
+        lines.append("")
 
     if SESSION.get("moves"):
-        sys.stdout.write(ANSI["dim"] + "Recent moves:" + ANSI["norm"] + "\n")
-        for line in SESSION["moves"][-6:]:
-            sys.stdout.write(f"  {line}\n")
-        sys.stdout.write("\n")
+        lines.append(ANSI["dim"] + "Recent moves:" + ANSI["norm"])
+        lines += [f"  {line}" for line in SESSION["moves"][-6:]]
+        lines.append("")
 
-    sys.stdout.write(ANSI["dim"] + "Keys: ↑/↓ select, Enter confirm, Esc back" + ANSI["norm"] + "\n")
-    sys.stdout.flush()
+    lines.append(ANSI["dim"] + "Keys: ↑/↓ select, Enter confirm, Esc back" + ANSI["norm"])
+    return lines
 
-def run_menu(title, items, ext_db_size=None):
-    idx = 0
+def draw_menu(title, items, idx, ext_db_size=None):
+    SCREEN.render(menu_lines(title, items, idx, ext_db_size=ext_db_size))
+
+def run_menu(title, items, ext_db_size=None, poll=None, idx=0):
+    """
+    poll: while set, the menu redraws every 0.25 s (live progress) and calls poll();
+    when it returns True the menu returns None (selection kept in SESSION["menu_idx"]).
+    """
     while True:
         draw_menu(title, items, idx, ext_db_size=ext_db_size)
-        k = term_get_key()
+        k = term_get_key(timeout=0.25 if poll is not None else None)
+        if k is None:
+            if poll():
+                SESSION["menu_idx"] = idx
+                return None
+            continue
         if k == "UP":
             idx = (idx - 1) % len(items)
         elif k == "DOWN":
@@ -508,6 +3225,7 @@ def run_menu(title, items, ext_db_size=None):
 
 def pause_screen(msg):
     ansi_enable_windows()
+    SCREEN.invalidate()
     sys.stdout.write(ANSI["clear"])
     sys.stdout.write(msg + "\n\nPress Enter...\n")
     sys.stdout.flush()
@@ -515,6 +3233,7 @@ def pause_screen(msg):
 
 def prompt_input(label, current=None, allow_empty=False):
     ansi_enable_windows()
+    SCREEN.invalidate()
     sys.stdout.write(ANSI["clear"])
     sys.stdout.write(label + "\n")
     if current is not None:
@@ -554,6 +3273,7 @@ def edit_config(cfg):
             "Set sort root = Downloads (keep inside Downloads)",
             f"Unknown folder: {d.get('unknown_folder','_Other')}",
             f"Dry-run: {d.get('dry_run', False)}",
+            f"Recursive: {d.get('recursive', False)} (max depth {d.get('max_depth', 3)})",
             "Rename category folders",
             "Back"
         ]
@@ -570,6 +3290,11 @@ def edit_config(cfg):
         elif c == 4:
             d["dry_run"] = (prompt_input("Dry-run? type y/n", "n") or "n").strip().lower().startswith(("y","j","1","t"))
         elif c == 5:
+            d["recursive"] = (prompt_input("Sort subfolders too? type y/n", "n") or "n").strip().lower().startswith(("y","j","1","t"))
+            if d["recursive"]:
+                depth = prompt_input("Max depth (0 = unlimited)", str(d.get("max_depth", 3)))
+                d["max_depth"] = int(depth) if str(depth).isdigit() else d.get("max_depth", 3)
+        elif c == 6:
             edit_folder_names(d)
         else:
             break
@@ -590,34 +3315,68 @@ def edit_folder_names(d):
 # ----------------------------
 # Main UI
 # ----------------------------
+class SortJob:
+    """sort_downloads() on a worker thread; the menu keeps drawing its Progress and can cancel it."""
+
+    def __init__(self, cfg):
+        self.progress = Progress()
+        self.cancel = threading.Event()
+        self.result = None
+        self.error = None
+        self.thread = threading.Thread(target=self._run, args=(cfg,), name="sort", daemon=True)
+        self.thread.start()
+
+    def _run(self, cfg):
+        try:
+            self.result = sort_downloads(cfg, sinks=[RecentMoves(30)], progress=self.progress, cancel=self.cancel)
+        except Exception as e:
+            self.error = e
+
+    def running(self) -> bool:
+        return self.thread.is_alive()
+
+def _finish_job(job):
+    SESSION["progress"] = None
+    if job.error is not None:
+        SESSION["status"] = f"Error: {job.error}"
+        return
+    res = job.result
+    SESSION["moves"] = res["moves"]
+    SESSION["move_summary"] = res["summary"][-30:]
+    SESSION["status"] = f"{'Cancelled' if res['cancelled'] else 'Done'}: moved={res['moved']} skipped={res['skipped']}"
+    SESSION["last_open_dir"] = res["sort_root"]
+
 def ui_main():
     cfg = load_config()
-    ext_to_cat, _ = build_ext_to_category(cfg)
-    ext_db_size = len(ext_to_cat)
+    ext_db_size = len(compile_classifier(cfg))
+    job = None
 
     while True:
+        if job is not None and not job.running():
+            _finish_job(job)
+            job = None
         items = [
-            "Run: Clean Downloads now",
+            "Cancel sort" if job is not None else "Run: Clean Downloads now",
             "Open sort root folder",
             "Edit config",
             "Show config + log paths",
             "Exit"
         ]
-        c = run_menu("Main menu", items, ext_db_size=ext_db_size)
+        c = run_menu("Main menu", items, ext_db_size=ext_db_size, idx=SESSION.pop("menu_idx", 0),
+                     poll=(lambda: not job.running()) if job is not None else None)
+        if c is None:
+            continue  # the sort finished: rebuild the menu
 
         if c == 0:
-            try:
+            if job is not None:
+                job.cancel.set()
+                SESSION["status"] = "Cancelling…"
+            else:
                 SESSION["status"] = "Sorting…"
                 SESSION["moves"] = []
                 SESSION["move_summary"] = []
-                res = sort_downloads(cfg)
-                SESSION["moves"] = res["moves"][-30:]
-                SESSION["move_summary"] = res["summary"][-30:]
-                SESSION["status"] = f"Done: moved={res['moved']} skipped={res['skipped']}"
-                SESSION["last_open_dir"] = res["sort_root"]
-                ext_db_size = res.get("ext_db_size", ext_db_size)
-            except Exception as e:
-                SESSION["status"] = f"Error: {e}"
+                job = SortJob(cfg)
+                SESSION["progress"] = job.progress
 
         elif c == 1:
             d = cfg["downloads"]
@@ -628,16 +3387,25 @@ def ui_main():
             SESSION["status"] = f"Opened: {root}"
 
         elif c == 2:
+            if job is not None:
+                SESSION["status"] = "Sorting… (config can be edited when it is done)"
+                continue
             edit_config(cfg)
             cfg = load_config()
-            ext_to_cat, _ = build_ext_to_category(cfg)
-            ext_db_size = len(ext_to_cat)
+            configure_logging(cfg["downloads"])
+            ext_db_size = len(compile_classifier(cfg))
             SESSION["status"] = "Config saved."
 
         elif c == 3:
             pause_screen(f"Config:\n{config_path()}\n\nLog:\n{log_path()}")
             SESSION["status"] = "Shown paths."
         else:
+            if job is not None:
+                # leave the journal clean: stop planning, let running moves finish
+                job.cancel.set()
+                SESSION["status"] = "Cancelling…"
+                draw_menu("Main menu", items, len(items) - 1, ext_db_size=ext_db_size)
+                job.thread.join()
             break
 
 
@@ -645,15 +3413,114 @@ def ui_main():
 # CLI
 # ----------------------------
 def main():
+    import argparse
     ap = argparse.ArgumentParser(prog=APP_FILE)
     ap.add_argument("--sort", action="store_true", help="Sort Downloads and exit")
+    ap.add_argument("--watch", action="store_true", help="Keep running and sort new downloads as they finish")
+    ap.add_argument("--dry-run", action="store_true", help="Plan only, nothing is moved (plan saved for --apply)")
+    ap.add_argument("--plan", metavar="FILE", help="Write the move plan (JSON Lines) to FILE instead of moving")
+    ap.add_argument("--apply", nargs="?", const="", metavar="FILE", help="Execute a saved plan (default: last dry-run)")
+    ap.add_argument("--undo", nargs="?", const="last", metavar="RUN_ID", help="Move the files of a run back (default: last run)")
+    ap.add_argument("--resume", nargs="?", const="last", metavar="RUN_ID", help="Finish an interrupted run from its journal")
+    ap.add_argument("--move-log", metavar="FILE", help="Append one JSON line per moved/skipped file to FILE")
+    ap.add_argument("--profile", nargs="?", const="", metavar="FILE",
+                    help="Print per-phase timings; with FILE also dump cProfile stats (pstats) there")
     args = ap.parse_args()
+    exit_on_sigterm()  # a killed --sort/--watch still flushes its log
 
+    if not args.profile:
+        return run_cli(args)
+    import cProfile
+    pr = cProfile.Profile()
+    pr.enable()
+    try:
+        return run_cli(args)
+    finally:
+        pr.disable()
+        pr.dump_stats(args.profile)
+        print(f"cProfile stats written to {args.profile} (python -m pstats {args.profile})")
+
+def print_profile(res):
+    prof = res.get("profile")
+    if not prof:
+        return
+    if prof.get("bytes_planned"):
+        print(f"Profile: wall {prof['wall_s']:.3f}s, {prof['bytes_planned']} bytes planned (nothing moved)")
+    else:
+        print(f"Profile: wall {prof['wall_s']:.3f}s, {prof['bytes_moved']} bytes moved")
+    for name, v in prof["phases"].items():
+        print(f"  {name:<20} {v['s']:>10.4f}s  {v['calls']:>8} calls")
+    if prof["move_latency_us"]:
+        print("  move latency (us): " + " ".join(f"{k}:{n}" for k, n in prof["move_latency_us"].items()))
+
+def print_roots(res, profile=False):
+    for r in res["roots"]:
+        if r["error"]:
+            print(f"  {r['path']}: ERROR {r['error']}")
+            continue
+        extra = f", plan={r['plan']}" if r["plan"] else ""
+        print(f"  {r['path']}: moved {r['moved']}, skipped {r['skipped']}, sort_root={r['sort_root']}{extra}")
+        if profile:
+            print_profile(r)
+
+def run_cli(args):
+    profile = args.profile is not None
+    sinks = [MoveLogSink(args.move_log)] if args.move_log else []
     cfg = load_config()
+    configure_logging(cfg["downloads"])
+    multi = bool(cfg["downloads"].get("roots"))
+    if multi and sinks and (args.sort or args.dry_run or args.plan):
+        sys.exit("--move-log is not supported with downloads.roots (roots run in separate processes)")
+
+    if args.apply is not None:
+        res = apply_plan(cfg, args.apply or None)
+        print(f"Applied {res['plan']}: moved {res['moved']} files, skipped {res['skipped']}")
+        return
+
+    if args.dry_run or args.plan:
+        if args.dry_run:
+            cfg["downloads"]["dry_run"] = True
+        if multi:
+            res = sort_roots(cfg, plan_out=args.plan, profile=profile)
+            print(f"Planned {res['moved']} moves in {len(res['roots'])} roots, skipped {res['skipped']}")
+            print_roots(res, profile)
+            return
+        res = sort_downloads(cfg, plan_out=args.plan, profile=profile, sinks=sinks)
+        print(f"Planned {res['moved']} moves, skipped {res['skipped']}, plan={res['plan']}")
+        print_profile(res)
+        return
+
+    if args.undo:
+        res = undo_run(cfg, args.undo)
+        if res["run_id"] is None:
+            print("Nothing to undo.")
+            return
+        print(f"Undo {res['run_id']}: restored {res['restored']} files, skipped {res['skipped']}")
+        return
+
+    if args.resume:
+        res = resume_run(cfg, args.resume)
+        if res["run_id"] is None:
+            print("Nothing to resume.")
+        else:
+            print(f"Resumed {res['run_id']}: moved {res['moved']} files, skipped {res['skipped']}")
+        return
+
+    if args.sort and multi:
+        res = sort_roots(cfg, profile=profile)
+        print(f"Moved {res['moved']} files in {len(res['roots'])} roots ({res['workers']} processes), skipped {res['skipped']}")
+        print_roots(res, profile)
+        return
 
     if args.sort:
-        res = sort_downloads(cfg)
+        res = sort_downloads(cfg, profile=profile, sinks=sinks)
         print(f"Moved {res['moved']} files, skipped {res['skipped']}, sort_root={res['sort_root']}, ext_db={res['ext_db_size']}")
+        print_profile(res)
+        return
+
+    if args.watch:
+        moved = watch_downloads(cfg)
+        print(f"Watch stopped, moved {moved} files")
         return
 
     ui_main()
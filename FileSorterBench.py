@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+FileSorterBench.py - Benchmark for FileSorter.sort_downloads
+
+- Builds a reproducible synthetic Downloads folder (same seed = same files).
+- Times each phase: generate, classifier, scan, plan, apply, full sort.
+- Reports files/sec, read/write syscalls and peak RSS as JSON, so runs can be
+  compared across commits. plan/sort also carry sort_downloads' own phase
+  timers (list, stat, classify, collision, journal, mkdir, move, ...).
+- --startup N: cold `--sort` start (fresh interpreter per run, one file waiting):
+  time to first file moved, wall time and an `-X importtime` breakdown.
+  With --max-ms it fails (exit 1) when the median is over budget.
+
+Runs in a throwaway config dir; your real FileSorter config is never touched.
+No external libs.
+
+Example:
+    python FileSorterBench.py --files 100000 --sort-root-base /dev/shm --out bench.json
+    python FileSorterBench.py --startup 20 --max-ms 50
+"""
+
+import os, sys, json, time, random, shutil, argparse, tempfile, subprocess, statistics
+from pathlib import Path
+
+
+# ----------------------------
+# Process counters
+# ----------------------------
+def read_write_syscalls():
+    # Linux only: syscr + syscw of this process (None elsewhere). Read- and write-type
+    # calls only (read, pread, readv, write, ...): stat, open, rename, getdents are not in it.
+    try:
+        with open("/proc/self/io", "r") as f:
+            vals = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(vals["syscr"]) + int(vals["syscw"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+def peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=Path(__file__).resolve().parent, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+class Phase:
+    """with Phase(report, "scan", files=n): ... -> seconds, files/sec, read/write syscalls, RSS."""
+
+    def __init__(self, report, name, files=0):
+        self.report = report
+        self.name = name
+        self.files = files
+
+    def __enter__(self):
+        self.sc = read_write_syscalls()
+        self.t = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        dt = time.perf_counter() - self.t
+        sc = read_write_syscalls()
+        self.report["phases"][self.name] = {
+            "seconds": round(dt, 6),
+            "files": self.files,
+            "files_per_sec": round(self.files / dt, 1) if self.files and dt > 0 else None,
+            "read_write_syscalls": (sc - self.sc) if sc is not None and self.sc is not None else None,
+            "peak_rss_bytes": peak_rss_bytes(),
+        }
+        return False
+
+
+# ----------------------------
+# Synthetic workload
+# ----------------------------
+def extension_pool(FileSorter):
+    """(ext, category) pairs from the builtin DB, plus a few split archive parts."""
+    pool = []
+    for c in FileSorter.build_builtin_categories(split_parts=False):
+        for e in sorted(c["exts"]):
+            pool.append((e, c["name"]))
+    pool += [(f".{i:03d}", "Archives") for i in range(1, 20)]
+    return pool
+
+def draw_size(rng, median, max_size):
+    # log-normal: lots of small files, a long tail of big ones
+    return int(min(max_size, max(0, rng.lognormvariate(0, 1.5) * median)))
+
+def generate(FileSorter, downloads: Path, sort_root: Path, files=10000, seed=1, unknown=0.05,
+             collisions=0.10, median=4096, max_size=8 << 20):
+    """
+    Creates `files` files in downloads. A `collisions` share of them already has a
+    same-named file in its category folder under sort_root (forces name__NNN).
+    Returns total bytes written.
+    """
+    rng = random.Random(seed)
+    pool = extension_pool(FileSorter)
+    folders = FileSorter.default_config()["downloads"]["folder_names"]
+    downloads.mkdir(parents=True, exist_ok=True)
+    total = 0
+    chunk = rng.randbytes(1 << 20)
+    for i in range(files):
+        if rng.random() < unknown:
+            ext, cat = "", None
+        else:
+            ext, cat = rng.choice(pool)
+        name = f"file_{i:07d}{ext}"
+        size = draw_size(rng, median, max_size)
+        with open(downloads / name, "wb") as f:
+            left = size
+            while left > 0:
+                n = min(left, len(chunk))
+                f.write(chunk[:n])
+                left -= n
+        total += size
+        # Images go to by-date folders (layout depends on mtime): no pre-made collisions there
+        if cat and cat != "Images" and rng.random() < collisions:
+            d = sort_root / folders.get(cat, cat)
+            d.mkdir(parents=True, exist_ok=True)
+            (d / name).write_bytes(b"x")
+    return total
+
+
+# ----------------------------
+# Bench run
+# ----------------------------
+def run(args) -> dict:
+    work = Path(tempfile.mkdtemp(prefix="fsbench-", dir=args.base))
+    sr_base = Path(tempfile.mkdtemp(prefix="fsbench-root-", dir=args.sort_root_base)) if args.sort_root_base else work
+    home = work / "home"
+    home.mkdir()
+    # throwaway config dir (FileSorter reads these at call time)
+    os.environ["HOME"] = str(home)
+    os.environ["APPDATA"] = str(home)
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import FileSorter
+
+    downloads = work / "Downloads"
+    sort_root = sr_base / "Sorted"
+    cfg = FileSorter.default_config()
+    d = cfg["downloads"]
+    d.update({"path": str(downloads), "sort_root": str(sort_root), "move_workers": args.workers,
+              "classifier_cache": False})
+
+    report = {
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "params": {"files": args.files, "seed": args.seed, "unknown": args.unknown,
+                   "collisions": args.collisions, "median_size": args.median_size,
+                   "max_size": args.max_size, "workers": args.workers,
+                   "downloads": str(downloads), "sort_root": str(sort_root),
+                   "cross_device": os.stat(work).st_dev != os.stat(sr_base).st_dev},
+        "phases": {},
+    }
+    n = args.files
+
+    def fresh():
+        shutil.rmtree(downloads, ignore_errors=True)
+        shutil.rmtree(sort_root, ignore_errors=True)
+        return generate(FileSorter, downloads, sort_root, n, args.seed, args.unknown,
+                        args.collisions, args.median_size, args.max_size)
+
+    try:
+        with Phase(report, "generate", n):
+            report["params"]["total_bytes"] = fresh()
+
+        with Phase(report, "classifier", 0):
+            FileSorter._CLASSIFIERS.clear()
+            FileSorter.compile_classifier(cfg)
+
+        with Phase(report, "scan", n):
+            sum(1 for _ in FileSorter.scan_files(downloads))
+
+        plan = work / "plan.jsonl"
+        with Phase(report, "plan", n):
+            res = FileSorter.sort_downloads(cfg, plan_out=plan, profile=args.profile)
+        report["phases"]["plan"].update(planned=res["moved"], profile=res["profile"])
+
+        with Phase(report, "apply", n):
+            res = FileSorter.apply_plan(cfg, plan)
+        report["phases"]["apply"].update(moved=res["moved"], skipped=res["skipped"])
+
+        fresh()
+        with Phase(report, "sort", n):
+            res = FileSorter.sort_downloads(cfg, profile=args.profile)
+        report["phases"]["sort"].update(moved=res["moved"], skipped=res["skipped"], profile=res["profile"])
+    finally:
+        report["peak_rss_bytes"] = peak_rss_bytes()
+        if FileSorter._LOG:
+            FileSorter._LOG[0].close()  # flush now, not at exit into a deleted folder
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+            if sr_base != work:
+                shutil.rmtree(sr_base, ignore_errors=True)
+    return report
+
+
+# ----------------------------
+# Startup bench (--startup)
+# ----------------------------
+def parse_importtime(stderr: str) -> dict:
+    """-X importtime lines -> total ms of top-level imports + the slowest modules (self time)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            self_us, cum_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # header line
+        rows.append((parts[2].rstrip(), self_us, cum_us))
+    top = [r for r in rows if not r[0].startswith("  ")]
+    return {
+        "imports_ms": round(sum(r[2] for r in top) / 1000, 2),
+        "modules": len(rows),
+        "slowest": [{"module": r[0].strip(), "self_ms": round(r[1] / 1000, 2)}
+                    for r in sorted(rows, key=lambda r: -r[1])[:10]],
+    }
+
+def startup(args) -> dict:
+    """One interpreter per run, one waiting file: what a login hook / cron job pays."""
+    here = Path(__file__).resolve().parent
+    work = Path(tempfile.mkdtemp(prefix="fsbench-start-", dir=args.base))
+    env = dict(os.environ, HOME=str(work), APPDATA=str(work))
+    env.pop("PYTHONDONTWRITEBYTECODE", None)  # -m runs from __pycache__ like an installed tool would
+    downloads = work / "Downloads"
+    downloads.mkdir()
+    cfg = {"downloads": {"path": str(downloads), "classifier_cache": True}}
+    conf = work / (os.path.join("FileSorter") if os.name == "nt" else os.path.join(".config", "FileSorter"))
+    conf.mkdir(parents=True)
+    (conf / "config.json").write_text(json.dumps(cfg), encoding="utf-8")
+
+    modes = {"module": [sys.executable, "-m", "FileSorter", "--sort"],
+             "script": [sys.executable, str(here / "FileSorter.py"), "--sort"]}
+    report = {"commit": git_commit(), "python": sys.version.split()[0], "platform": sys.platform,
+              "runs": args.startup, "modes": {}}
+    try:
+        for mode, cmd in modes.items():
+            first, wall = [], []
+            for i in range(args.startup + 1):  # run 0 warms __pycache__ and the classifier snapshot
+                f = downloads / f"startup_{mode}_{i}.pdf"
+                f.write_bytes(b"x")
+                t0 = time.time_ns()
+                subprocess.run(cmd, env=env, cwd=here, check=True, capture_output=True)
+                t1 = time.time_ns()
+                moved = downloads / "Documents" / f.name
+                if i:
+                    # ctime is set by the rename itself: a clock-tick accurate "first file moved"
+                    first.append((moved.stat().st_ctime_ns - t0) / 1e6)
+                    wall.append((t1 - t0) / 1e6)
+            f = downloads / f"startup_{mode}_x.pdf"
+            f.write_bytes(b"x")
+            out = subprocess.run([cmd[0], "-X", "importtime", *cmd[1:]], env=env, cwd=here,
+                                 check=True, capture_output=True, text=True)
+            report["modes"][mode] = {
+                "first_move_ms": {"median": round(statistics.median(first), 2), "min": round(min(first), 2)},
+                "wall_ms": {"median": round(statistics.median(wall), 2), "min": round(min(wall), 2)},
+                "importtime": parse_importtime(out.stderr),
+            }
+        if args.max_ms is not None:
+            got = report["modes"]["module"]["first_move_ms"]["median"]
+            report["budget_ms"] = args.max_ms
+            report["ok"] = got <= args.max_ms
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+    return report
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+def main():
+    ap = argparse.ArgumentParser(prog=Path(__file__).name)
+    ap.add_argument("--files", type=int, default=10000, help="Number of files to generate")
+    ap.add_argument("--seed", type=int, default=1, help="Random seed (same seed = same workload)")
+    ap.add_argument("--unknown", type=float, default=0.05, help="Share of files without a known extension")
+    ap.add_argument("--collisions", type=float, default=0.10, help="Share of files whose name already exists at the target")
+    ap.add_argument("--median-size", type=int, default=4096, help="Median file size in bytes")
+    ap.add_argument("--max-size", type=int, default=8 << 20, help="Largest file in bytes")
+    ap.add_argument("--workers", type=int, default=4, help="move_workers for the run")
+    ap.add_argument("--base", default=None, help="Where Downloads is generated (default: system temp)")
+    ap.add_argument("--sort-root-base", default=None, help="Put sort_root elsewhere, e.g. /dev/shm for a cross-device run")
+    ap.add_argument("--keep", action="store_true", help="Keep the generated folders")
+    ap.add_argument("--no-profile", dest="profile", action="store_false",
+                    help="Time plan/sort without sort_downloads' internal phase timers")
+    ap.add_argument("--out", default=None, help="Write the JSON report to a file instead of stdout")
+    ap.add_argument("--startup", type=int, default=0, metavar="N", help="Benchmark cold --sort starts instead (N runs per mode)")
+    ap.add_argument("--max-ms", type=float, default=None, help="With --startup: exit 1 if the median time to first move is above this")
+    args = ap.parse_args()
+
+    report = startup(args) if args.startup else run(args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if report.get("ok") is False:
+        sys.exit(f"startup regression: first move took {report['modes']['module']['first_move_ms']['median']} ms "
+                 f"(budget {report['budget_ms']} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,18 @@
 import ctypes, ctypes.wintypes as wt
-import time, math, random, shutil, sys, msvcrt, os
+import time, math, random, shutil, sys, os, threading
+from collections import namedtuple
 
 
-kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
-iphlpapi = ctypes.WinDLL("iphlpapi", use_last_error=True)
-psapi    = ctypes.WinDLL("psapi", use_last_error=True)
-pdh      = ctypes.WinDLL("pdh", use_last_error=True)
+# Win32 DLLs are loaded by _load_win32() (the first Win32Provider), so the
+# module imports on Linux too.
+kernel32 = iphlpapi = psapi = pdh = None
 
 
+STD_INPUT_HANDLE = -10
 STD_OUTPUT_HANDLE = -11
 ENABLE_VIRTUAL_TERMINAL_PROCESSING = 0x0004
+KEY_EVENT, FOCUS_EVENT = 0x0001, 0x0010
+WAIT_OBJECT_0 = 0
 
 PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
 PROCESS_VM_READ = 0x0010
@@ -18,6 +21,9 @@ ERROR_INSUFFICIENT_BUFFER = 122
 
 
 def enable_vt():
+    if os.name != "nt":
+        return
+    _load_win32()
     h = kernel32.GetStdHandle(STD_OUTPUT_HANDLE)
     mode = ctypes.c_uint()
     if kernel32.GetConsoleMode(h, ctypes.byref(mode)):
@@ -49,6 +55,114 @@ def show_cursor():
     sys.stdout.flush()
 
 
+class KEY_EVENT_RECORD(ctypes.Structure):
+    _fields_ = [("bKeyDown", wt.BOOL), ("wRepeatCount", wt.WORD), ("wVirtualKeyCode", wt.WORD),
+                ("wVirtualScanCode", wt.WORD), ("uChar", wt.WCHAR), ("dwControlKeyState", wt.DWORD)]
+
+
+class FOCUS_EVENT_RECORD(ctypes.Structure):
+    _fields_ = [("bSetFocus", wt.BOOL)]
+
+
+class INPUT_RECORD(ctypes.Structure):
+    class _E(ctypes.Union):
+        _fields_ = [("KeyEvent", KEY_EVENT_RECORD), ("FocusEvent", FOCUS_EVENT_RECORD),
+                    ("_size", ctypes.c_byte * 16)]  # mouse/resize/menu records: ignored
+    _fields_ = [("EventType", wt.WORD), ("Event", _E)]
+
+
+class KeyInput:
+    """Single-key input: console input records on Windows, cbreak stdin elsewhere.
+
+    Focus changes end up in .focused: on POSIX terminals focus reporting
+    (CSI ?1004h) is switched on and the focus-in/out reports are swallowed,
+    on a Windows console ReadConsoleInputW delivers FOCUS_EVENT records next
+    to the keys. Redirected Windows stdin falls back to msvcrt (no focus).
+    """
+
+    FOCUS_IN, FOCUS_OUT = "\x1b[I", "\x1b[O"
+
+    def __init__(self):
+        self.old = None
+        self.focused = True
+        self.eof = False
+        self.hin = None
+        if os.name == "nt":
+            _load_win32()
+            h = kernel32.GetStdHandle(STD_INPUT_HANDLE)
+            mode = wt.DWORD()
+            if h and kernel32.GetConsoleMode(h, ctypes.byref(mode)):
+                self.hin = h
+                self.rec = INPUT_RECORD()
+                self.nread = wt.DWORD()
+        elif sys.stdin.isatty():
+            import termios, tty
+            self.old = termios.tcgetattr(sys.stdin.fileno())
+            tty.setcbreak(sys.stdin.fileno())
+            sys.stdout.write("\x1b[?1004h")
+            sys.stdout.flush()
+
+    def poll(self):
+        return self.wait(0.0)
+
+    def wait(self, timeout):
+        """Block up to timeout seconds for a key; returns it, or None."""
+        if self.hin is not None:
+            return self._wait_console(timeout)
+        if os.name == "nt":
+            import msvcrt
+            end = time.monotonic() + timeout
+            while not msvcrt.kbhit():
+                left = end - time.monotonic()
+                if left <= 0:
+                    return None
+                time.sleep(min(left, 0.01))
+            return msvcrt.getwch()
+        if self.eof:
+            time.sleep(max(0.0, timeout))
+            return None
+        import select
+        fd = sys.stdin.fileno()
+        if not select.select([fd], [], [], max(0.0, timeout))[0]:
+            return None
+        data = os.read(fd, 64).decode("utf-8", "ignore")
+        if not data:
+            self.eof = True  # stdin closed: stop select() spinning on it
+            return None
+        i, o = data.rfind(self.FOCUS_IN), data.rfind(self.FOCUS_OUT)
+        if i >= 0 or o >= 0:
+            self.focused = i > o
+            data = data.replace(self.FOCUS_IN, "").replace(self.FOCUS_OUT, "")
+        return data[:1] or None
+
+    def _wait_console(self, timeout):
+        end = time.monotonic() + max(0.0, timeout)
+        rec = self.rec
+        while True:
+            ms = max(0, int((end - time.monotonic()) * 1000))
+            if kernel32.WaitForSingleObject(self.hin, ms) != WAIT_OBJECT_0:
+                return None
+            if not kernel32.ReadConsoleInputW(self.hin, ctypes.byref(rec), 1, ctypes.byref(self.nread)):
+                return None
+            if rec.EventType == FOCUS_EVENT:
+                self.focused = bool(rec.Event.FocusEvent.bSetFocus)
+                return None  # let the caller react to the change now
+            if rec.EventType == KEY_EVENT:
+                ke = rec.Event.KeyEvent
+                if ke.bKeyDown and ke.uChar != "\0":
+                    return ke.uChar
+            if time.monotonic() >= end:
+                return None
+
+    def close(self):
+        if self.old is not None:
+            import termios
+            sys.stdout.write("\x1b[?1004l")
+            sys.stdout.flush()
+            termios.tcsetattr(sys.stdin.fileno(), termios.TCSADRAIN, self.old)
+            self.old = None
+
+
 def clamp(x, a, b):
     return a if x < a else b if x > b else x
 
@@ -109,10 +223,6 @@ class MEMORYSTATUSEX(ctypes.Structure):
     ]
 
 
-kernel32.GlobalMemoryStatusEx.argtypes = [ctypes.POINTER(MEMORYSTATUSEX)]
-kernel32.GlobalMemoryStatusEx.restype = ctypes.c_int
-
-
 def read_mem():
     st = MEMORYSTATUSEX()
     st.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
@@ -144,10 +254,6 @@ class PERFORMANCE_INFORMATION(ctypes.Structure):
     ]
 
 
-psapi.GetPerformanceInfo.argtypes = [ctypes.POINTER(PERFORMANCE_INFORMATION), ctypes.c_uint32]
-psapi.GetPerformanceInfo.restype = ctypes.c_int
-
-
 def read_system_reserved_pct():
     pi = PERFORMANCE_INFORMATION()
     pi.cb = ctypes.sizeof(PERFORMANCE_INFORMATION)
@@ -183,10 +289,6 @@ class MIB_IFROW(ctypes.Structure):
     ]
 
 
-iphlpapi.GetIfTable.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_ulong), ctypes.c_int]
-iphlpapi.GetIfTable.restype = ctypes.c_ulong
-
-
 def read_net_octets():
     size = ctypes.c_ulong(0)
     rc = iphlpapi.GetIfTable(None, ctypes.byref(size), 0)
@@ -222,15 +324,6 @@ PDH_HCOUNTER = ctypes.c_void_p
 PDH_FMT_DOUBLE = 0x00000200
 PDH_MORE_DATA = 0x800007D2
 
-pdh.PdhOpenQueryW.argtypes = [ctypes.c_wchar_p, ctypes.c_void_p, ctypes.POINTER(PDH_HQUERY)]
-pdh.PdhOpenQueryW.restype = ctypes.c_ulong
-pdh.PdhAddEnglishCounterW.argtypes = [PDH_HQUERY, ctypes.c_wchar_p, ctypes.c_void_p, ctypes.POINTER(PDH_HCOUNTER)]
-pdh.PdhAddEnglishCounterW.restype = ctypes.c_ulong
-pdh.PdhCollectQueryData.argtypes = [PDH_HQUERY]
-pdh.PdhCollectQueryData.restype = ctypes.c_ulong
-pdh.PdhCloseQuery.argtypes = [PDH_HQUERY]
-pdh.PdhCloseQuery.restype = ctypes.c_ulong
-
 
 class PDH_FMT_COUNTERVALUE(ctypes.Structure):
     class _V(ctypes.Union):
@@ -245,23 +338,10 @@ class PDH_FMT_COUNTERVALUE(ctypes.Structure):
     _fields_ = [("CStatus", ctypes.c_ulong), ("V", _V)]
 
 
-pdh.PdhGetFormattedCounterValue.argtypes = [
-    PDH_HCOUNTER, ctypes.c_ulong, ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(PDH_FMT_COUNTERVALUE)
-]
-pdh.PdhGetFormattedCounterValue.restype = ctypes.c_ulong
-
-
 class PDH_FMT_COUNTERVALUE_ITEM_W(ctypes.Structure):
     _fields_ = [("szName", ctypes.c_wchar_p), ("FmtValue", PDH_FMT_COUNTERVALUE)]
 
 
-pdh.PdhGetFormattedCounterArrayW.argtypes = [
-    PDH_HCOUNTER, ctypes.c_ulong, ctypes.POINTER(ctypes.c_ulong),
-    ctypes.POINTER(ctypes.c_ulong), ctypes.c_void_p
-]
-pdh.PdhGetFormattedCounterArrayW.restype = ctypes.c_ulong
-
-
 class CpuReader:
     def __init__(self):
         self.q = PDH_HQUERY()
@@ -345,19 +425,6 @@ class GpuReader:
 
 
 # ---- RAM hog (group by exe, take max) ----
-kernel32.OpenProcess.argtypes = [wt.DWORD, wt.BOOL, wt.DWORD]
-kernel32.OpenProcess.restype  = wt.HANDLE
-kernel32.CloseHandle.argtypes = [wt.HANDLE]
-kernel32.CloseHandle.restype  = wt.BOOL
-
-psapi.EnumProcesses.argtypes = [ctypes.POINTER(wt.DWORD), wt.DWORD, ctypes.POINTER(wt.DWORD)]
-psapi.EnumProcesses.restype  = wt.BOOL
-
-psapi.GetProcessImageFileNameW.argtypes = [wt.HANDLE, wt.LPWSTR, wt.DWORD]
-psapi.GetProcessImageFileNameW.restype  = wt.DWORD
-
-psapi.GetProcessMemoryInfo.argtypes = [wt.HANDLE, ctypes.c_void_p, wt.DWORD]
-psapi.GetProcessMemoryInfo.restype  = wt.BOOL
 
 
 class PROCESS_MEMORY_COUNTERS_EX2(ctypes.Structure):
@@ -393,69 +460,557 @@ class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
     ]
 
 
-def enum_pids():
-    size = 4096
-    while True:
-        arr = (wt.DWORD * size)()
-        needed = wt.DWORD(0)
-        if not psapi.EnumProcesses(arr, ctypes.sizeof(arr), ctypes.byref(needed)):
-            return []
-        count = needed.value // ctypes.sizeof(wt.DWORD)
-        if count < size:
-            return arr[:count]
-        size *= 2
-        if size > 1_000_000:
-            return []
-
-
-def read_top_ram_group(total_phys):
+def group_top(entries, total_phys):
+    """Largest exe group by memory: (name, bytes, pct of total_phys, count)."""
     if total_phys <= 0:
         return "", 0, 0.0, 0
-
     totals = {}  # name -> [bytes, count]
+    for e in entries:
+        cur = totals.get(e.name)
+        if cur is None:
+            totals[e.name] = [e.mem, 1]
+        else:
+            cur[0] += e.mem
+            cur[1] += 1
+    if not totals:
+        return "", 0, 0.0, 0
+    best_name, (best_bytes, best_cnt) = max(totals.items(), key=lambda kv: kv[1][0])
+    return best_name, best_bytes, best_bytes / total_phys, best_cnt
 
-    for pid in enum_pids():
-        if pid == 0:
-            continue
 
-        h = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION | PROCESS_VM_READ, False, int(pid))
-        if not h:
-            continue
+class ProcEntry:
+    """One live process. name/exe/cmdline are fetched once per (pid, start);
+    cmdline only on Linux (on Windows it sits in the target's PEB)."""
+
+    __slots__ = ("pid", "start", "name", "exe", "cmdline", "mem", "cpu_t", "cpu_pct",
+                 "stat_fd", "statm_fd", "handle")
+
+    def __init__(self, pid, start, name, exe="", cmdline=""):
+        self.pid = pid
+        self.start = start
+        self.name = name
+        self.exe = exe
+        self.cmdline = cmdline
+        self.mem = 0
+        self.cpu_t = None     # cumulative CPU seconds at the last refresh
+        self.cpu_pct = 0.0    # of one core, between the last two refreshes
+        self.stat_fd = self.statm_fd = -1
+        self.handle = None    # Win32: process handle kept across scans
+
+
+class ProcTableBase:
+    """Persistent process table, diffed against the live PID set each scan.
+
+    New PIDs get their static attributes read once; PIDs that left the set
+    are dropped; everything else only has its memory/CPU counters refreshed.
+    """
+
+    def __init__(self):
+        self.entries = {}   # pid -> ProcEntry
+        self.t_scan = None
+        self.added = self.removed = 0   # churn of the last scan
+        self.scan_s = 0.0
+
+    def scan(self):
+        t0 = time.monotonic()
+        dt = (t0 - self.t_scan) if self.t_scan is not None else 0.0
+        self.t_scan = t0
+        live = self._pids()
+        ents = self.entries
+        gone = [pid for pid in ents if pid not in live]
+        for pid in gone:
+            self._drop(ents.pop(pid))
+        added = 0
+        for pid in live:
+            e = ents.get(pid)
+            if e is None:
+                e = self._discover(pid)
+                if e is None:
+                    continue
+                ents[pid] = e
+                added += 1
+            if not self._refresh(e, dt):
+                self._drop(ents.pop(pid))
+                gone.append(pid)
+        self.added, self.removed = added, len(gone)
+        self.scan_s = time.monotonic() - t0
+        return ents
+
+    def _drop(self, e):
+        pass
+
+    def close(self):
+        for e in self.entries.values():
+            self._drop(e)
+        self.entries = {}
 
+
+def _cpu_pct(e, cpu_t, dt):
+    if e.cpu_t is not None and dt > 0:
+        e.cpu_pct = max(0.0, cpu_t - e.cpu_t) / dt
+    e.cpu_t = cpu_t
+
+
+def _filetime(ft):
+    return (ft.dwHighDateTime << 32) | ft.dwLowDateTime
+
+
+class Win32ProcTable(ProcTableBase):
+    """EnumProcesses, with one process handle per process kept across scans.
+
+    A scan costs GetProcessTimes + GetProcessMemoryInfo per process; the
+    handle is opened once, on discovery. It also pins the process object,
+    so its PID can't be reused while we hold it; a nonzero exit time means
+    it is gone. Past the handle budget handles are opened per scan and the
+    creation time (the other half of the key) is re-checked instead. PIDs
+    that refuse OpenProcess are not retried until they leave the PID list.
+    """
+
+    HANDLE_BUDGET = 4096
+
+    def __init__(self):
+        super().__init__()
+        self.pid_buf = (wt.DWORD * 4096)()
+        self.name_buf = ctypes.create_unicode_buffer(1024)
+        self.pmc2 = PROCESS_MEMORY_COUNTERS_EX2()
+        self.pmc2.cb = ctypes.sizeof(self.pmc2)
+        self.pmc = PROCESS_MEMORY_COUNTERS()
+        self.pmc.cb = ctypes.sizeof(self.pmc)
+        self.times = (wt.FILETIME * 4)()  # creation, exit, kernel, user
+        self.denied = set()
+        self.handles = 0
+
+    def _pids(self):
+        while True:
+            needed = wt.DWORD(0)
+            if not psapi.EnumProcesses(self.pid_buf, ctypes.sizeof(self.pid_buf), ctypes.byref(needed)):
+                return set()
+            count = needed.value // ctypes.sizeof(wt.DWORD)
+            if count < len(self.pid_buf):
+                live = set(self.pid_buf[:count])
+                break
+            if len(self.pid_buf) >= 1_000_000:
+                return set()
+            self.pid_buf = (wt.DWORD * (len(self.pid_buf) * 2))()
+        live.discard(0)
+        self.denied &= live
+        return live - self.denied
+
+    def _times(self, h):
+        """(creation, exited, cpu seconds) or None."""
+        t = self.times
+        if not kernel32.GetProcessTimes(h, ctypes.byref(t[0]), ctypes.byref(t[1]),
+                                        ctypes.byref(t[2]), ctypes.byref(t[3])):
+            return None
+        return _filetime(t[0]), _filetime(t[1]) != 0, (_filetime(t[2]) + _filetime(t[3])) / 1e7
+
+    def _open(self, pid):
+        return kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION | PROCESS_VM_READ, False, int(pid))
+
+    def _discover(self, pid):
+        h = self._open(pid)
+        if not h:
+            self.denied.add(pid)
+            return None
+        tm = self._times(h)
+        n = psapi.GetProcessImageFileNameW(h, self.name_buf, len(self.name_buf))
+        exe = self.name_buf.value if n else ""
+        name = os.path.basename(exe) or f"PID {pid}"
+        e = ProcEntry(pid, tm[0] if tm else 0, name, exe)
+        if self.handles < self.HANDLE_BUDGET:
+            e.handle = h
+            self.handles += 1
+        else:
+            kernel32.CloseHandle(h)
+        return e
+
+    def _refresh(self, e, dt):
+        h = e.handle
+        if h is None:
+            h = self._open(e.pid)
+            if not h:
+                return False
         try:
-            mem = 0
-            pmc2 = PROCESS_MEMORY_COUNTERS_EX2()
-            pmc2.cb = ctypes.sizeof(pmc2)
-            if psapi.GetProcessMemoryInfo(h, ctypes.byref(pmc2), pmc2.cb):
-                mem = int(pmc2.PrivateWorkingSetSize) or int(pmc2.WorkingSetSize)
+            tm = self._times(h)
+            if tm is not None and (tm[1] or (e.handle is None and tm[0] != e.start)):
+                return False  # exited, or PID reused: rediscovered next scan
+            if psapi.GetProcessMemoryInfo(h, ctypes.byref(self.pmc2), self.pmc2.cb):
+                e.mem = int(self.pmc2.PrivateWorkingSetSize) or int(self.pmc2.WorkingSetSize)
+            elif psapi.GetProcessMemoryInfo(h, ctypes.byref(self.pmc), self.pmc.cb):
+                e.mem = int(self.pmc.WorkingSetSize)
             else:
-                pmc = PROCESS_MEMORY_COUNTERS()
-                pmc.cb = ctypes.sizeof(pmc)
-                if psapi.GetProcessMemoryInfo(h, ctypes.byref(pmc), pmc.cb):
-                    mem = int(pmc.WorkingSetSize)
-                else:
-                    continue
+                return False
+            if tm is not None:
+                _cpu_pct(e, tm[2], dt)
+            return True
+        finally:
+            if e.handle is None:
+                kernel32.CloseHandle(h)
+
+    def _drop(self, e):
+        if e.handle is not None:
+            kernel32.CloseHandle(e.handle)
+            e.handle = None
+            self.handles -= 1
+
+
+# ---- Win32 DLL setup ----
+def _load_win32():
+    """Load the Win32 DLLs and declare the prototypes the readers use (once)."""
+    global kernel32, iphlpapi, psapi, pdh
+    if kernel32 is not None:
+        return
+    k32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    iphlpapi = ctypes.WinDLL("iphlpapi", use_last_error=True)
+    psapi    = ctypes.WinDLL("psapi", use_last_error=True)
+    pdh      = ctypes.WinDLL("pdh", use_last_error=True)
+
+    k32.GlobalMemoryStatusEx.argtypes = [ctypes.POINTER(MEMORYSTATUSEX)]
+    k32.GlobalMemoryStatusEx.restype = ctypes.c_int
+    k32.OpenProcess.argtypes = [wt.DWORD, wt.BOOL, wt.DWORD]
+    k32.OpenProcess.restype  = wt.HANDLE
+    k32.CloseHandle.argtypes = [wt.HANDLE]
+    k32.CloseHandle.restype  = wt.BOOL
+    k32.GetStdHandle.argtypes = [wt.DWORD]
+    k32.GetStdHandle.restype  = wt.HANDLE
+    k32.WaitForSingleObject.argtypes = [wt.HANDLE, wt.DWORD]
+    k32.WaitForSingleObject.restype  = wt.DWORD
+    k32.ReadConsoleInputW.argtypes = [wt.HANDLE, ctypes.POINTER(INPUT_RECORD), wt.DWORD, ctypes.POINTER(wt.DWORD)]
+    k32.ReadConsoleInputW.restype  = wt.BOOL
+
+    psapi.GetPerformanceInfo.argtypes = [ctypes.POINTER(PERFORMANCE_INFORMATION), ctypes.c_uint32]
+    psapi.GetPerformanceInfo.restype = ctypes.c_int
+    psapi.EnumProcesses.argtypes = [ctypes.POINTER(wt.DWORD), wt.DWORD, ctypes.POINTER(wt.DWORD)]
+    psapi.EnumProcesses.restype  = wt.BOOL
+    psapi.GetProcessImageFileNameW.argtypes = [wt.HANDLE, wt.LPWSTR, wt.DWORD]
+    psapi.GetProcessImageFileNameW.restype  = wt.DWORD
+    psapi.GetProcessMemoryInfo.argtypes = [wt.HANDLE, ctypes.c_void_p, wt.DWORD]
+    psapi.GetProcessMemoryInfo.restype  = wt.BOOL
+    k32.GetProcessTimes.argtypes = [wt.HANDLE] + [ctypes.POINTER(wt.FILETIME)] * 4
+    k32.GetProcessTimes.restype  = wt.BOOL
+
+    iphlpapi.GetIfTable.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_ulong), ctypes.c_int]
+    iphlpapi.GetIfTable.restype = ctypes.c_ulong
+
+    pdh.PdhOpenQueryW.argtypes = [ctypes.c_wchar_p, ctypes.c_void_p, ctypes.POINTER(PDH_HQUERY)]
+    pdh.PdhOpenQueryW.restype = ctypes.c_ulong
+    pdh.PdhAddEnglishCounterW.argtypes = [PDH_HQUERY, ctypes.c_wchar_p, ctypes.c_void_p, ctypes.POINTER(PDH_HCOUNTER)]
+    pdh.PdhAddEnglishCounterW.restype = ctypes.c_ulong
+    pdh.PdhCollectQueryData.argtypes = [PDH_HQUERY]
+    pdh.PdhCollectQueryData.restype = ctypes.c_ulong
+    pdh.PdhCloseQuery.argtypes = [PDH_HQUERY]
+    pdh.PdhCloseQuery.restype = ctypes.c_ulong
+    pdh.PdhGetFormattedCounterValue.argtypes = [
+        PDH_HCOUNTER, ctypes.c_ulong, ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(PDH_FMT_COUNTERVALUE)
+    ]
+    pdh.PdhGetFormattedCounterValue.restype = ctypes.c_ulong
+    pdh.PdhGetFormattedCounterArrayW.argtypes = [
+        PDH_HCOUNTER, ctypes.c_ulong, ctypes.POINTER(ctypes.c_ulong),
+        ctypes.POINTER(ctypes.c_ulong), ctypes.c_void_p
+    ]
+    pdh.PdhGetFormattedCounterArrayW.restype = ctypes.c_ulong
+    kernel32 = k32  # publish last: it doubles as the "loaded" flag
+
+
+# ---- Metrics providers ----
+# A provider owns whatever handles its platform needs and answers:
+#   read_cpu() / read_gpu() -> 0..1
+#   read_mem()            -> (total_bytes, used_bytes, used_pct, sys_pct)
+#   read_net()            -> (rx_octets, tx_octets) of physical interfaces, cumulative,
+#                            wrapping at NET_MASK
+#   read_top_ram_group(total_phys) -> (name, bytes, pct, count)
+#   close()
+# read_top_ram_group runs on the sampler's "procs" thread, everything else on
+# "stats": a provider keeps the state of the two apart and needs no locks.
+class Win32Provider:
+    name = "win32"
+    label = "Windows"
+    NET_MASK = 0xFFFFFFFF  # MIB_IFROW octet counters are 32-bit
 
-            buf = ctypes.create_unicode_buffer(1024)
-            n = psapi.GetProcessImageFileNameW(h, buf, 1024)
-            name = os.path.basename(buf.value) if n else f"PID {pid}"
-            if not name:
-                name = f"PID {pid}"
+    def __init__(self):
+        _load_win32()
+        self.cpu = CpuReader()
+        self.gpu = GpuReader()
+        self.procs = Win32ProcTable()
 
-            cur = totals.get(name)
-            if cur is None:
-                totals[name] = [mem, 1]
+    def read_cpu(self):
+        return self.cpu.read_pct()
+
+    def read_gpu(self):
+        return self.gpu.read_pct()
+
+    def read_mem(self):
+        return (*read_mem(), read_system_reserved_pct())
+
+    def read_net(self):
+        return read_net_octets()
+
+    def read_top_ram_group(self, total_phys):
+        return group_top(self.procs.scan().values(), total_phys)
+
+    def close(self):
+        for r in (self.cpu, self.gpu, self.procs):
+            try:
+                r.close()
+            except Exception:
+                pass
+
+
+class ProcFile:
+    """A /proc (or /sys) file kept open and re-read in place.
+
+    read() re-generates the file with one preadv() into a preallocated
+    bytearray and returns the byte count; parse straight out of .buf.
+    """
+
+    def __init__(self, path, size=4096):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY | getattr(os, "O_CLOEXEC", 0))
+        self.buf = bytearray(size)
+
+    def read(self):
+        while True:
+            if hasattr(os, "preadv"):
+                n = os.preadv(self.fd, [self.buf], 0)
             else:
-                cur[0] += mem
-                cur[1] += 1
+                data = os.pread(self.fd, len(self.buf), 0)
+                n = len(data)
+                self.buf[:n] = data
+            if n < len(self.buf):
+                return n
+            self.buf = bytearray(len(self.buf) * 2)  # outgrew it: grow once, keep
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def _meminfo_kb(buf, n, key):
+    i = buf.find(key, 0, n)
+    if i < 0:
+        return 0
+    j = buf.find(b"\n", i + 1, n)
+    return int(buf[i + len(key):j if j >= 0 else n].split()[0])
+
+
+class LinuxProcTable(ProcTableBase):
+    """/proc/<pid>/stat and statm, kept open per process while fds last.
+
+    stat gives the start time (the key) and CPU ticks, statm the resident
+    and shared pages; both are preadv()'d into one shared buffer. An open
+    fd also pins the process: after it exits reads fail with ESRCH, so a
+    reused PID can't pass for the old one. Past the fd budget files are
+    opened per scan and the start time is re-checked instead.
+    """
+
+    def __init__(self, root="/proc"):
+        super().__init__()
+        self.root = root
+        self.buf = bytearray(1024)
+        self.page = os.sysconf("SC_PAGE_SIZE")
+        self.hz = os.sysconf("SC_CLK_TCK")
+        try:
+            import resource
+            soft = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+        except (ImportError, OSError, ValueError):
+            soft = 1024
+        if soft < 0:
+            soft = 8192  # RLIM_INFINITY
+        self.fd_budget = max(0, min(4096, soft // 2 - 32))
+        self.fds = 0
+
+    def _pids(self):
+        return {int(n) for n in os.listdir(self.root) if n.isdigit()}
+
+    def _read(self, e, attr, name):
+        fd = getattr(e, attr)
+        if fd >= 0:
+            return os.preadv(fd, [self.buf], 0)
+        fd = os.open(f"{self.root}/{e.pid}/{name}", os.O_RDONLY | os.O_CLOEXEC)
+        if self.fds < self.fd_budget:
+            setattr(e, attr, fd)
+            self.fds += 1
+            return os.preadv(fd, [self.buf], 0)
+        try:
+            return os.preadv(fd, [self.buf], 0)
         finally:
-            kernel32.CloseHandle(h)
+            os.close(fd)
 
-    if not totals:
-        return "", 0, 0.0, 0
+    def _discover(self, pid):
+        e = ProcEntry(pid, 0, "")
+        try:
+            n = self._read(e, "stat_fd", "stat")
+            buf = self.buf
+            r = buf.rfind(b")", 0, n)
+            comm = buf[buf.find(b"(", 0, n) + 1:r].decode("utf-8", "replace")
+            e.start = int(buf[r + 2:n].split(None, 20)[19])
+        except (OSError, ValueError, IndexError):
+            self._drop(e)
+            return None
+        e.name = comm or f"PID {pid}"
+        base = f"{self.root}/{pid}"
+        try:
+            e.exe = os.readlink(base + "/exe")
+        except OSError:
+            pass  # kernel thread, or not ours to look at
+        try:
+            with open(base + "/cmdline", "rb") as f:
+                e.cmdline = f.read(4096).replace(b"\0", b" ").strip().decode("utf-8", "replace")
+        except OSError:
+            pass
+        return e
+
+    def _refresh(self, e, dt):
+        try:
+            n = self._read(e, "stat_fd", "stat")
+            buf = self.buf
+            f = buf[buf.rfind(b")", 0, n) + 2:n].split(None, 20)
+            if e.stat_fd < 0 and int(f[19]) != e.start:
+                return False  # PID reused: rediscovered next scan
+            cpu_t = (int(f[11]) + int(f[12])) / self.hz
+            n = self._read(e, "statm_fd", "statm")
+            f = self.buf[:n].split(None, 3)
+            resident, shared = int(f[1]), int(f[2])
+        except (OSError, ValueError, IndexError):
+            return False
+        _cpu_pct(e, cpu_t, dt)
+        # resident minus file-backed/shared pages: the private working set
+        e.mem = (resident - shared if resident > shared else resident) * self.page
+        return True
+
+    def _drop(self, e):
+        for attr in ("stat_fd", "statm_fd"):
+            fd = getattr(e, attr)
+            if fd >= 0:
+                os.close(fd)
+                setattr(e, attr, -1)
+                self.fds -= 1
+
+
+class LinuxProcProvider:
+    name = "proc"
+    label = "Linux"
+    NET_MASK = 0xFFFFFFFFFFFFFFFF
+
+    # amdgpu/i915-style busy counters; first one that exists wins
+    GPU_BUSY = ("/sys/class/drm/card0/device/gpu_busy_percent",
+                "/sys/class/drm/card1/device/gpu_busy_percent")
+    SYS_NET = "/sys/class/net"
+
+    def __init__(self, root="/proc"):
+        self.stat = ProcFile(os.path.join(root, "stat"), 16384)
+        self.meminfo = ProcFile(os.path.join(root, "meminfo"), 8192)
+        self.netdev = ProcFile(os.path.join(root, "net/dev"), 8192)
+        self.root = root
+        self.phys = {}  # interface name -> has a device (cached: names don't change kind)
+        self.gpu = None
+        for p in self.GPU_BUSY:
+            try:
+                self.gpu = ProcFile(p, 64)
+                break
+            except OSError:
+                pass
+        self.procs = LinuxProcTable(root)
+        self.prev_busy = self.prev_total = 0
+        self.read_cpu()  # prime
+
+    def read_cpu(self):
+        st = self.stat
+        n = st.read()
+        j = st.buf.find(b"\n", 0, n)
+        f = st.buf[:j].split()  # b"cpu" user nice system idle iowait irq softirq steal ...
+        idle = int(f[4]) + (int(f[5]) if len(f) > 5 else 0)
+        total = 0
+        for x in f[1:9]:
+            total += int(x)
+        busy = total - idle
+        db, dt = busy - self.prev_busy, total - self.prev_total
+        self.prev_busy, self.prev_total = busy, total
+        return clamp(db / dt, 0.0, 1.0) if dt > 0 else 0.0
+
+    def read_gpu(self):
+        if self.gpu is None:
+            return 0.0
+        try:
+            n = self.gpu.read()
+            return clamp(int(self.gpu.buf[:n]) / 100.0, 0.0, 1.0)
+        except (OSError, ValueError):
+            return 0.0
+
+    def read_mem(self):
+        m = self.meminfo
+        n = m.read()
+        total_kb = _meminfo_kb(m.buf, n, b"MemTotal:")
+        total = total_kb * 1024
+        used = max(0, total - _meminfo_kb(m.buf, n, b"MemAvailable:") * 1024)
+        # page cache + buffers + kernel slab: the closest thing to the Win32
+        # SystemCache + KernelTotal figure
+        sys_kb = (_meminfo_kb(m.buf, n, b"\nCached:") + _meminfo_kb(m.buf, n, b"Buffers:")
+                  + _meminfo_kb(m.buf, n, b"Slab:"))
+        sys_pct = clamp((sys_kb / total_kb) if total_kb else 0.0, 0.0, 1.0)
+        return total, used, (used / total) if total else 0.0, sys_pct
+
+    def _physical(self, name):
+        # real NICs have a device link; lo, bridges, veth, docker, tun, ifb don't
+        phys = self.phys.get(name)
+        if phys is None:
+            phys = self.phys[name] = os.path.exists(f"{self.SYS_NET}/{name.decode('ascii', 'replace')}/device")
+        return phys
+
+    def read_net(self):
+        nd = self.netdev
+        n = nd.read()
+        buf = nd.buf
+        i = buf.find(b"\n", buf.find(b"\n", 0, n) + 1, n) + 1  # skip 2 header lines
+        rx = tx = 0
+        any_rx = any_tx = 0  # every interface but lo, if none of them is physical (containers)
+        found = False
+        while 0 < i < n:
+            j = buf.find(b"\n", i, n)
+            if j < 0:
+                j = n
+            c = buf.find(b":", i, j)
+            name = bytes(buf[i:c].strip()) if c > 0 else b"lo"
+            if name != b"lo":
+                f = buf[c + 1:j].split()
+                if self._physical(name):
+                    found = True
+                    rx += int(f[0])
+                    tx += int(f[8])
+                elif not found:
+                    any_rx += int(f[0])
+                    any_tx += int(f[8])
+            i = j + 1
+        return (rx, tx) if found else (any_rx, any_tx)
+
+    def read_top_ram_group(self, total_phys):
+        return group_top(self.procs.scan().values(), total_phys)
+
+    def close(self):
+        for f in (self.stat, self.meminfo, self.netdev, self.gpu):
+            if f is not None:
+                f.close()
+        self.procs.close()
+
+
+PROVIDERS = {"win32": Win32Provider, "proc": LinuxProcProvider}
 
-    best_name, (best_bytes, best_cnt) = max(totals.items(), key=lambda kv: kv[1][0])
-    return best_name, best_bytes, (best_bytes / total_phys) if total_phys else 0.0, best_cnt
+
+def open_provider(name=None):
+    """Pick a metrics provider: $SYSOVERVIEW_PROVIDER, else by platform."""
+    name = name or os.environ.get("SYSOVERVIEW_PROVIDER")
+    if not name:
+        if os.name == "nt":
+            name = "win32"
+        elif os.path.exists("/proc/stat"):
+            name = "proc"
+        else:
+            raise RuntimeError(f"no metrics provider for platform {sys.platform!r}")
+    cls = PROVIDERS.get(name)
+    if cls is None:
+        raise RuntimeError(f"unknown metrics provider {name!r} (have: {', '.join(PROVIDERS)})")
+    return cls()
 
 
 # ---- Creature / moods ----
@@ -494,12 +1049,12 @@ def pick_face(mood, t, blink):
     return top, mid, bot
 
 
-def sys_sentence(sys_pct):
+def sys_sentence(sys_pct, label="Windows"):
     if sys_pct >= 0.28:
-        return "Windows landlord tax."
+        return f"{label} landlord tax."
     if sys_pct >= 0.18:
-        return "Windows is hoarding cache."
-    return "Windows behaving."
+        return f"{label} is hoarding cache."
+    return f"{label} behaving."
 
 
 class Particles:
@@ -515,8 +1070,8 @@ class Particles:
                            random.choice([-1, 1]) * random.random() * 0.4,
                            random.choice(["·", ".", "*", "+", "°"])])
 
-    def step(self, w, h, energy):
-        k = 0.25 + 1.75 * energy
+    def step(self, w, h, energy, dt=1 / 60):
+        k = (0.25 + 1.75 * energy) * dt * 60  # speeds are tuned per 60 Hz step
         for q in self.p:
             q[0] += q[2] * k
             q[1] += q[3] * k
@@ -533,214 +1088,591 @@ def bar_line(name, pct, inner_w):
     return left + bar(pct, bw) + right
 
 
-def main():
-    enable_vt()
-    enter_alt()
-    hide_cursor()
-
-    cpu_reader = CpuReader()
-    gpu_reader = GpuReader()
-    stars = Particles()
-
-    # slower updates + anti-0-glitch
-    STATS_DT = 0.25      # stats refresh rate
-    PROC_DT  = 1.25      # scan processes slower
+# ---- Frame rendering ----
+class Canvas:
+    """One frame as a flat w*h list of single-char cells, reused every tick."""
+
+    def __init__(self, w, h):
+        self.w, self.h = w, h
+        self.blank = [" "] * (w * h)
+        self.cells = self.blank[:]
+
+    def clear(self):
+        self.cells[:] = self.blank
+
+    def put(self, y, x, s):
+        if 0 <= y < self.h:
+            a, b = max(0, x), min(self.w, x + len(s))
+            if a < b:
+                o = y * self.w
+                self.cells[o + a:o + b] = s[a - x:b - x]
+
+    def rows(self):
+        c, w = self.cells, self.w
+        return ["".join(c[i:i + w]) for i in range(0, len(c), w)]
+
+
+class DiffRenderer:
+    """Double-buffered terminal writer.
+
+    Keeps the rows last sent; each frame writes a cursor move plus text
+    only for runs of changed cells. Runs less than MERGE_GAP cells apart
+    are merged, since re-sending a few unchanged cells is cheaper than
+    another cursor move. max_bps > 0 caps output with a token bucket:
+    while the bucket is in debt frames are held back, and their changes
+    go out with the next frame that is sent.
+    """
+
+    MERGE_GAP = 8
+
+    def __init__(self, out=None, max_bps=0):
+        self.out = out if out is not None else sys.stdout.buffer
+        self.max_bps = max_bps
+        self.prev = None      # rows as last sent
+        self.attr = None
+        self.tokens = float(max_bps)
+        self.t_last = None
+        self.frames = self.skipped = self.bytes = self.last_bytes = 0
+
+    def invalidate(self):
+        self.prev = None
+
+    def diff(self, rows, attr):
+        prev = self.prev
+        if prev is None or attr != self.attr or len(prev) != len(rows) or len(prev[0]) != len(rows[0]):
+            parts = [attr, "\x1b[2J"]
+            for y, row in enumerate(rows):
+                parts.append(f"\x1b[{y + 1};1H")
+                parts.append(row)
+            return parts
+
+        parts = []
+        gap = self.MERGE_GAP
+        for y, (old, new) in enumerate(zip(prev, rows)):
+            if old == new:
+                continue
+            w = len(new)
+            x = 0
+            while x < w:
+                if old[x] == new[x]:
+                    x += 1
+                    continue
+                a = x
+                b = x = x + 1
+                while x < w and x - b < gap:
+                    if old[x] != new[x]:
+                        b = x + 1
+                    x += 1
+                parts.append(f"\x1b[{y + 1};{a + 1}H")
+                parts.append(new[a:b])
+        return parts
+
+    def frame(self, rows, attr="", now=None):
+        """Send one frame; returns the bytes written (0: unchanged or held back)."""
+        if self.max_bps > 0:
+            now = time.monotonic() if now is None else now
+            if self.t_last is not None:
+                self.tokens = min(self.max_bps, self.tokens + (now - self.t_last) * self.max_bps)
+            self.t_last = now
+            if self.tokens <= 0:
+                self.skipped += 1
+                self.last_bytes = 0
+                return 0
+
+        parts = self.diff(rows, attr)
+        self.prev = rows
+        self.attr = attr
+        self.frames += 1
+        self.last_bytes = 0
+        if not parts:
+            return 0
+        data = "".join(parts).encode("utf-8")
+        self.out.write(data)
+        self.out.flush()
+        n = self.last_bytes = len(data)
+        self.bytes += n
+        self.tokens -= n
+        return n
+
+
+def scene_mood(m):
+    cpu = m.cpu
+    net = m.rx_bps + m.tx_bps
+    if m.mem_pct > 0.93:
+        return "PANIC"
+    if m.top_pct > 0.10:
+        return "CHROME"
+    if cpu > 0.92:
+        return "RAGE"
+    if cpu > 0.75:
+        return "TNT"
+    if m.gpu_pct > 0.80:
+        return "SHADERS"
+    if m.sys_pct > 0.26:
+        return "WIN"
+    if net > 2_000_000:
+        return "HYPER"
+    if cpu < 0.08 and m.mem_pct < 0.55:
+        return "SLEEPY"
+    return "OK"
+
+
+FACE_PCT = 0.03     # a bar has to move 3 points ...
+FACE_NET = 0.25     # ... a rate 25% (and FACE_NET_MIN B/s) to count as a change
+FACE_NET_MIN = 4096
+
+
+def face_moved(a, b, up_only=False):
+    """Did the panel change visibly between Samples a and b?
+
+    Small jitter does not count: the monitor's own frames move CPU by a
+    point or so, which must not keep it out of idle. up_only: only rising
+    load counts, for waking up from idle, where the monitor itself just got
+    cheaper and the numbers drop because of it. main() idles on this.
+    """
+    if a.top_name != b.top_name or a.top_cnt != b.top_cnt:
+        return True
+    for x, y in ((a.cpu_bar, b.cpu_bar), (a.mem_pct, b.mem_pct), (a.sys_pct, b.sys_pct),
+                 (a.gpu_pct, b.gpu_pct), (a.top_pct, b.top_pct)):
+        d = y - x if up_only else abs(y - x)
+        if d >= FACE_PCT:
+            return True
+    for x, y in ((a.rx_bps, b.rx_bps), (a.tx_bps, b.tx_bps)):
+        d = y - x if up_only else abs(y - x)
+        if d >= FACE_NET_MIN and d >= FACE_NET * max(x, y):
+            return True
+    return False
+
+
+def scene_energy(m):
+    net_energy = clamp((m.rx_bps + m.tx_bps) / 4_000_000.0, 0.0, 1.0)
+    return clamp(0.12 + 0.75 * m.cpu_bar + 0.55 * net_energy + 0.25 * m.gpu_pct, 0.0, 1.0)
+
+
+def draw_scene(cv, stars, now, mood, m, label="Windows", status="", extra=""):
+    w, h = cv.w, cv.h
+    cv.clear()
+    cells = cv.cells
+    for x, y, _, _, ch in stars.p:
+        xi, yi = int(x), int(y)
+        if 0 <= yi < h and 0 <= xi < w:
+            cells[yi * w + xi] = ch
+
+    beat = 0.5 + 0.5 * math.sin(now * 2.2)
+    blink = (int(now * 10) % 37) == 0
+
+    box_w = min(86, max(56, w - 4))
+    box_h = 16
+    x0 = (w - box_w) // 2
+    y0 = (h - box_h) // 2
+    inner_w = box_w - 4
+    put = cv.put
+
+    put(y0, x0, "╭" + "─" * (box_w - 2) + "╮")
+    for i in range(1, box_h - 1):
+        put(y0 + i, x0, "│" + " " * (box_w - 2) + "│")
+    put(y0 + box_h - 1, x0, "╰" + "─" * (box_w - 2) + "╯")
+
+    heart = "♥" if beat > 0.5 else "♡"
+    put(y0 + 1, x0 + 2, fit(f"Heart: {heart}   Mood: {mood}", inner_w))
+
+    cx = x0 + box_w // 2
+    cy = y0 + 2
+    face0, face1, face2 = pick_face(mood, now, blink)
+    put(cy + 0, cx - 3, face0)
+    put(cy + 1, cx - 3, face1)
+
+    put(y0 + 6, x0 + 2, fit(bar_line("CPU", m.cpu_bar, inner_w), inner_w))
+    put(y0 + 7, x0 + 2, fit(bar_line("RAM", m.mem_pct, inner_w), inner_w))
+
+    top_name = m.top_name
+    if top_name:
+        hog = f"RAM hog: {top_name} ({m.top_cnt}) {int(m.top_pct*100):2d}% {human_bytes(m.top_bytes)}"
+    else:
+        hog = "RAM hog: <unknown>"
+    put(y0 + 8, x0 + 2, fit(hog, inner_w))
+
+    sys_pct = m.sys_pct
+    sys_text = f"SYS {int(sys_pct*100):3d}%  {sys_sentence(sys_pct, label)}"
+    put(y0 + 9, x0 + 2, fit(sys_text, inner_w))
+
+    put(y0 + 10, x0 + 2, fit(bar_line("GPU", m.gpu_pct, inner_w), inner_w))
+    put(y0 + 11, x0 + 2, fit(f"NET {human_bps(m.rx_bps)} ↓   {human_bps(m.tx_bps)} ↑", inner_w))
+
+    roast_default = {
+        "SLEEPY":  "Cat idle. If it dies, it dies.",
+        "OK":      "Stable. Boring. Good.",
+        "HYPER":   "Zoomies. Packets doing parkour.",
+        "SHADERS": "GPU glam. FPS debt incoming.",
+        "TNT":     "CPU >75%. Heat mode engaged.",
+        "PANIC":   "RAM is gone. This is not fine.",
+        "RAGE":    "CPU boss fight. Something is cooking hard.",
+        "WIN":     f"{label} reserved more. For what? Vibes.",
+    }
+    if mood == "CHROME":
+        eater = top_name or "Something"
+        roast = f"{eater} is eating RAM. Close it, champ."
+    else:
+        roast = roast_default[mood]
+
+    if extra:
+        put(y0 + 12, x0 + 2, fit(extra, inner_w))
+    put(y0 + 13, x0 + 2, fit(roast, inner_w))
+    keys = "Keys: q=quit   r=reset stars   s=sampler"
+    put(y0 + box_h - 2, x0 + 2, fit(keys + status.rjust(inner_w - len(keys)), inner_w))
+
+
+# ---- Frame scheduling ----
+class Task:
+    def __init__(self, name, period, fn, due):
+        self.name = name
+        self.period = period
+        self.fn = fn
+        self.due = due
+        self.runs = 0
+        self.missed = 0
+        self.late = 0.0       # lateness of the last run
+        self.late_sum = 0.0
+        self.late_max = 0.0
+
+
+class Scheduler:
+    """Periodic tasks on one monotonic clock, each with its own deadline.
+
+    A task that runs a little late keeps its phase (due += period). One
+    that slipped a whole period counts as missed and is re-anchored on now
+    instead of firing a burst of catch-up runs.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.tasks = {}
+
+    def add(self, name, period, fn, delay=0.0):
+        t = self.tasks[name] = Task(name, period, fn, self.clock() + delay)
+        return t
+
+    def set_period(self, name, period):
+        t = self.tasks[name]
+        if period < t.period:
+            t.due = min(t.due, self.clock() + period)  # speeding up applies now
+        t.period = period
+
+    def wake(self, name):
+        self.tasks[name].due = self.clock()
+
+    def run_due(self):
+        for t in self.tasks.values():
+            now = self.clock()
+            if now < t.due:
+                continue
+            late = now - t.due
+            t.late = late
+            t.late_sum += late
+            if late > t.late_max:
+                t.late_max = late
+            if late >= t.period:
+                t.missed += 1
+                t.due = now + t.period
+            else:
+                t.due += t.period
+            t.runs += 1
+            t.fn(now)
+
+    def next_due(self):
+        return min(t.due for t in self.tasks.values())
+
+    def missed(self):
+        return sum(t.missed for t in self.tasks.values())
+
+
+# ---- Background sampling ----
+Sample = namedtuple("Sample", "seq cpu cpu_bar mem_pct sys_pct gpu_pct rx_bps tx_bps "
+                              "top_name top_bytes top_pct top_cnt total_phys")
+EMPTY_SAMPLE = Sample(0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, "", 0, 0.0, 0, 0)
+
+
+class Collector:
+    def __init__(self, name, budget, fn):
+        self.name = name
+        self.budget = budget   # seconds one run may take before it is stretched
+        self.fn = fn
+        self.task = None       # its Scheduler task: due time, lateness counters
+        self.took = self.took_max = 0.0
+        self.over = 0          # runs that blew the budget
+        self.errors = 0
+
+
+class Sampler:
+    """Runs the provider's collectors on background daemon threads.
+
+    Every collector has its own interval and time budget and returns a dict
+    of Sample fields, which are folded into a new immutable Sample that
+    replaces .latest. The render loop only ever reads that one reference,
+    so it never waits on a collector. The process scan gets a thread of its
+    own so it can't hold up the cheap counters either. A collector that
+    overruns its budget has its next run pushed back to keep its duty
+    cycle at budget/interval. Lateness is counted on each collector's Task.
+    """
+
+    # name: (interval, budget, thread)
+    INTERVALS = {
+        "cpu":   (0.25, 0.02, "stats"),
+        "mem":   (0.25, 0.02, "stats"),
+        "net":   (0.25, 0.02, "stats"),
+        "gpu":   (0.25, 0.05, "stats"),
+        "procs": (1.25, 0.25, "procs"),
+    }
 
     CPU_GLITCH_FLOOR = 0.02   # treat <2% as "maybe glitch"
     CPU_GLITCH_HOLD_S = 0.40  # hide brief dips
     CPU_TAU_UP = 0.25         # bar reacts quickly up
     CPU_TAU_DOWN = 0.80       # bar falls slower (no 18->0->18)
 
-    prev_net = read_net_octets()
-    last_stats = 0.0
-    last_proc = 0.0
-
-    cpu_raw = 0.0       # PDH raw
-    cpu_num = 0.0       # displayed number (raw + glitch-hold)
-    cpu_bar = 0.0       # displayed bar (smoothed)
-    last_nonzero = 0.0
+    def __init__(self, provider):
+        self.provider = provider
+        self.latest = EMPTY_SAMPLE
+        self.scheds = {}       # thread name -> Scheduler
+        self.collectors = {}
+        self._publish = threading.Lock()  # writers only; readers take .latest as is
+        self._stop = threading.Event()
+        self._threads = []
+        now = time.monotonic()
+        self._cpu_t = self._net_t = now
+        self._last_nonzero = 0.0
+        self._prev_net = None
+        for name, fn in (("cpu", self._cpu), ("mem", self._mem), ("net", self._net),
+                         ("gpu", self._gpu), ("procs", self._procs)):
+            interval, budget, thread = self.INTERVALS[name]
+            self.add(name, interval, budget, fn, thread)
+        # total_phys up front, before any thread runs: the procs scan needs it and
+        # must not read meminfo itself (that file belongs to the stats thread)
+        self._collect(self.collectors["mem"], now)
+
+    def add(self, name, interval, budget, fn, thread="stats"):
+        c = self.collectors[name] = Collector(name, budget, fn)
+        sched = self.scheds.setdefault(thread, Scheduler())
+        c.task = sched.add(name, interval, lambda now: self._collect(c, now))
+
+    def start(self):
+        for name, sched in self.scheds.items():
+            t = threading.Thread(target=self._run, args=(sched,), name=f"sampler-{name}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=2.0)
+
+    def _run(self, sched):
+        while not self._stop.is_set():
+            sched.run_due()
+            self._stop.wait(max(0.0, sched.next_due() - time.monotonic()))
+
+    def _collect(self, c, now):
+        start = time.monotonic()
+        try:
+            fields = c.fn(now)
+        except Exception:
+            c.errors += 1  # a flaky counter must not take the thread down
+            fields = None
+        took = c.took = time.monotonic() - start
+        if took > c.took_max:
+            c.took_max = took
+        if took > c.budget:
+            c.over += 1
+            t = c.task
+            t.due = max(t.due, start + t.period * took / c.budget)
+        if fields:
+            with self._publish:
+                cur = self.latest
+                self.latest = cur._replace(seq=cur.seq + 1, **fields)
+
+    # -- collectors (sampler thread only) --
+    def _cpu(self, now):
+        dt = max(1e-3, now - self._cpu_t)
+        self._cpu_t = now
+        cur = self.latest
+        cpu = cur.cpu
+        raw = self.provider.read_cpu()
+        if raw > self.CPU_GLITCH_FLOOR:
+            self._last_nonzero = now
+        # "don't show 0" if it bounces: only hold for a short time window
+        if not (raw < self.CPU_GLITCH_FLOOR and (now - self._last_nonzero) < self.CPU_GLITCH_HOLD_S):
+            cpu = raw
+        bar_pct = ema_asym(cur.cpu_bar, cpu, dt, tau_up=self.CPU_TAU_UP, tau_down=self.CPU_TAU_DOWN)
+        return {"cpu": cpu, "cpu_bar": bar_pct}
+
+    def _mem(self, now):
+        total, _, mem_pct, sys_pct = self.provider.read_mem()
+        return {"total_phys": total, "mem_pct": mem_pct, "sys_pct": sys_pct}
+
+    def _net(self, now):
+        cur = self.provider.read_net()
+        prev, self._prev_net = self._prev_net, cur
+        dt = max(1e-3, now - self._net_t)
+        self._net_t = now
+        if prev is None:
+            return None
+        mask = self.provider.NET_MASK
+        return {"rx_bps": ((cur[0] - prev[0]) & mask) / dt, "tx_bps": ((cur[1] - prev[1]) & mask) / dt}
+
+    def _gpu(self, now):
+        return {"gpu_pct": self.provider.read_gpu()}
+
+    def _procs(self, now):
+        name, nbytes, pct, cnt = self.provider.read_top_ram_group(self.latest.total_phys)
+        return {"top_name": name, "top_bytes": nbytes, "top_pct": pct, "top_cnt": cnt}
+
+    def lag_text(self):
+        """Per-collector lateness, last/max in ms, with budget overruns."""
+        parts = []
+        for name, c in self.collectors.items():
+            t = c.task
+            p = f"{name} {t.late * 1000:.0f}/{t.late_max * 1000:.0f}"
+            if c.over:
+                p += f"!{c.over}"
+            parts.append(p)
+        return "late ms " + "  ".join(parts)
+
+    def max_late(self):
+        return max(c.task.late for c in self.collectors.values())
+
+
+def bench_render(frames=600, w=100, h=30, fps=60, max_bps=0):
+    """Headless: bytes per frame of the old full-screen write vs DiffRenderer.
+
+    Drives the real scene (particles, bars, heart) with synthetic metrics
+    and simulated time, so runs are repeatable.
+    """
+    import io
+    random.seed(1)
+    stars = Particles()
+    stars.reset(w, h, n=min(180, max(70, (w * h) // 90)))
+    cv = Canvas(w, h)
+    sink = io.BytesIO()
+    diff = DiffRenderer(out=sink, max_bps=max_bps)
+    full_bytes = []
+    diff_bytes = []
+    t_cpu = 0.0
+    for i in range(frames):
+        now = i / fps
+        cpu = 0.35 + 0.3 * math.sin(now / 3)
+        m = EMPTY_SAMPLE._replace(cpu=cpu, cpu_bar=cpu, mem_pct=0.62, sys_pct=0.2, gpu_pct=0.1,
+                                  rx_bps=150_000.0, tx_bps=20_000.0, top_name="python",
+                                  top_bytes=512 << 20, top_pct=0.06, top_cnt=3)
+        mood = scene_mood(m)
+        stars.step(w, h, scene_energy(m))
+        draw_scene(cv, stars, now, mood, m, "Linux")
+        rows = cv.rows()
+        col = color_for(mood)
+        full_bytes.append(len(("\x1b[H" + col + "\n".join(rows) + "\x1b[0m").encode("utf-8")))
+        t0 = time.perf_counter()
+        diff_bytes.append(diff.frame(rows, col, now=now))
+        t_cpu += time.perf_counter() - t0
+
+    def line(name, xs):
+        avg = sum(xs) / len(xs)
+        return f"  {name:<6} {avg:9.0f} B/frame  max {max(xs):6d}  {avg * fps / 1024:8.1f} KiB/s"
+
+    print(f"render bench: {frames} frames {w}x{h} @ {fps} fps"
+          + (f", budget {max_bps} B/s" if max_bps else ""))
+    print(line("full", full_bytes))
+    print(line("diff", diff_bytes))
+    print(f"  diff   {t_cpu / frames * 1e6:9.0f} us/frame"
+          + (f", {diff.skipped} frames held back" if diff.skipped else ""))
 
-    mem_pct = 0.0
-    sys_pct = 0.0
-    gpu_pct = 0.0
-    rx_bps = tx_bps = 0.0
-    total_phys = 0
 
-    top_ram_name = ""
-    top_ram_bytes = 0
-    top_ram_pct = 0.0
-    top_ram_cnt = 0
+def main():
+    provider = open_provider()
+    sampler = Sampler(provider)
+    enable_vt()
+    keys = KeyInput()
+    enter_alt()
+    hide_cursor()
 
-    prev_wh = None
+    stars = Particles()
 
+    FRAME_DT = 1 / 60    # animate + draw while someone is watching
+    IDLE_DT  = 1 / 4     # unfocused, or the metrics stood still: particles freeze
+    IDLE_AFTER = 3.0     # seconds without face_moved() before idling
+    SELF_DT  = 1.0       # self-CPU / fps readout
+
+    st = {
+        "last_sim": time.monotonic(), "idle": False, "face": None, "face_t": time.monotonic(),
+        "status": "", "show_lag": False,
+        "self_t": time.monotonic(), "self_cpu": time.process_time(), "self_frames": 0,
+    }
+    cv = None
+    renderer = DiffRenderer(max_bps=int(os.environ.get("SYSOVERVIEW_MAX_BPS") or 0))
+
+    def simulate(now):
+        dt = min(0.5, now - st["last_sim"])
+        st["last_sim"] = now
+        if cv is not None and not st["idle"]:
+            stars.step(cv.w, cv.h, scene_energy(sampler.latest), dt)
+
+    def render(now):
+        m = sampler.latest
+        if st["face"] is None or face_moved(st["face"], m, up_only=st["idle"]):
+            st["face"], st["face_t"] = m, now  # the next change is measured from here
+        mood = scene_mood(m)
+        extra = sampler.lag_text() if st["show_lag"] else ""
+        draw_scene(cv, stars, now, mood, m, provider.label, st["status"], extra)
+        renderer.frame(cv.rows(), color_for(mood))
+        st["self_frames"] += 1
+
+    def self_stats(now):
+        cpu = time.process_time()
+        wall = max(1e-3, now - st["self_t"])
+        st["status"] = (f"self {100 * (cpu - st['self_cpu']) / wall:4.1f}% cpu"
+                        f"  {st['self_frames'] / wall:2.0f} fps  missed {sched.missed()}"
+                        f"  lag {sampler.max_late() * 1000:.0f}ms")
+        st["self_t"], st["self_cpu"], st["self_frames"] = now, cpu, 0
+
+    sched = Scheduler()
+    sched.add("sim", FRAME_DT, simulate)
+    sched.add("frame", FRAME_DT, render)
+    sched.add("self", SELF_DT, self_stats, delay=SELF_DT)
+
+    sampler.start()
     try:
         while True:
-            now = time.time()
             w, h = shutil.get_terminal_size((110, 34))
-
-            if prev_wh != (w, h):
-                sys.stdout.write("\x1b[2J\x1b[H")
-                sys.stdout.flush()
-                prev_wh = (w, h)
+            if cv is None or (cv.w, cv.h) != (w, h):
+                cv = Canvas(w, h)
+                renderer.invalidate()
                 stars.p = []
 
             if not stars.p:
                 stars.reset(w, h, n=min(180, max(70, (w * h) // 90)))
 
-            if now - last_stats >= STATS_DT:
-                dt = max(1e-3, now - last_stats)
-
-                cpu_raw = cpu_reader.read_pct()
-
-                if cpu_raw > CPU_GLITCH_FLOOR:
-                    last_nonzero = now
-
-                # "don't show 0" if it bounces: only hold for a short time window
-                if cpu_raw < CPU_GLITCH_FLOOR and (now - last_nonzero) < CPU_GLITCH_HOLD_S:
-                    cpu_num = cpu_num  # keep last number
-                else:
-                    cpu_num = cpu_raw
-
-                cpu_bar = ema_asym(cpu_bar, cpu_num, dt, tau_up=CPU_TAU_UP, tau_down=CPU_TAU_DOWN)
-
-                total_phys, _, mem_pct = read_mem()
-                sys_pct = read_system_reserved_pct()
-                gpu_pct = gpu_reader.read_pct()
-
-                cur_net = read_net_octets()
-                drx = (cur_net[0] - prev_net[0]) & 0xFFFFFFFF
-                dtx = (cur_net[1] - prev_net[1]) & 0xFFFFFFFF
-                rx_bps = drx / dt
-                tx_bps = dtx / dt
-                prev_net = cur_net
-
-                last_stats = now
-
-            if now - last_proc >= PROC_DT:
-                top_ram_name, top_ram_bytes, top_ram_pct, top_ram_cnt = read_top_ram_group(total_phys)
-                last_proc = now
-
-            beat = 0.5 + 0.5 * math.sin(now * 2.2)
-            blink = (int(now * 10) % 37) == 0
-
-            cpu = cpu_num
-            net = rx_bps + tx_bps
-
-            if mem_pct > 0.93:
-                mood = "PANIC"
-            elif top_ram_pct > 0.10:
-                mood = "CHROME"
-            elif cpu > 0.92:
-                mood = "RAGE"
-            elif cpu > 0.75:
-                mood = "TNT"
-            elif gpu_pct > 0.80:
-                mood = "SHADERS"
-            elif sys_pct > 0.26:
-                mood = "WIN"
-            elif net > 2_000_000:
-                mood = "HYPER"
-            elif cpu < 0.08 and mem_pct < 0.55:
-                mood = "SLEEPY"
-            else:
-                mood = "OK"
-
-            col = color_for(mood)
-            net_energy = clamp(net / 4_000_000.0, 0.0, 1.0)
-            energy = clamp(0.12 + 0.75 * cpu_bar + 0.55 * net_energy + 0.25 * gpu_pct, 0.0, 1.0)
-
-            stars.step(w, h, energy)
-
-            canvas = [[" "] * w for _ in range(h)]
-            for x, y, _, _, ch in stars.p:
-                xi, yi = int(x), int(y)
-                if 0 <= yi < h and 0 <= xi < w:
-                    canvas[yi][xi] = ch
-
-            box_w = min(86, max(56, w - 4))
-            box_h = 16
-            x0 = (w - box_w) // 2
-            y0 = (h - box_h) // 2
-            inner_w = box_w - 4
-
-            def put(y, x, s):
-                if 0 <= y < h:
-                    for i, c in enumerate(s):
-                        xx = x + i
-                        if 0 <= xx < w:
-                            canvas[y][xx] = c
-
-            put(y0, x0, "╭" + "─" * (box_w - 2) + "╮")
-            for i in range(1, box_h - 1):
-                put(y0 + i, x0, "│" + " " * (box_w - 2) + "│")
-            put(y0 + box_h - 1, x0, "╰" + "─" * (box_w - 2) + "╯")
-
-            heart = "♥" if beat > 0.5 else "♡"
-            put(y0 + 1, x0 + 2, fit(f"Heart: {heart}   Mood: {mood}", inner_w))
-
-            cx = x0 + box_w // 2
-            cy = y0 + 2
-            face0, face1, face2 = pick_face(mood, now, blink)
-            put(cy + 0, cx - 3, face0)
-            put(cy + 1, cx - 3, face1)
-
-            put(y0 + 6, x0 + 2, fit(bar_line("CPU", cpu_bar, inner_w), inner_w))
-            put(y0 + 7, x0 + 2, fit(bar_line("RAM", mem_pct, inner_w), inner_w))
-
-            if top_ram_name:
-                hog = f"RAM hog: {top_ram_name} ({top_ram_cnt}) {int(top_ram_pct*100):2d}% {human_bytes(top_ram_bytes)}"
-            else:
-                hog = "RAM hog: <unknown>"
-            put(y0 + 8, x0 + 2, fit(hog, inner_w))
-
-            sys_text = f"SYS {int(sys_pct*100):3d}%  {sys_sentence(sys_pct)}"
-            put(y0 + 9, x0 + 2, fit(sys_text, inner_w))
-
-            put(y0 + 10, x0 + 2, fit(bar_line("GPU", gpu_pct, inner_w), inner_w))
-            put(y0 + 11, x0 + 2, fit(f"NET {human_bps(rx_bps)} ↓   {human_bps(tx_bps)} ↑", inner_w))
-
-            roast_default = {
-                "SLEEPY":  "Cat idle. If it dies, it dies.",
-                "OK":      "Stable. Boring. Good.",
-                "HYPER":   "Zoomies. Packets doing parkour.",
-                "SHADERS": "GPU glam. FPS debt incoming.",
-                "TNT":     "CPU >75%. Heat mode engaged.",
-                "PANIC":   "RAM is gone. This is not fine.",
-                "RAGE":    "CPU boss fight. Something is cooking hard.",
-                "WIN":     "Windows reserved more. For what? Vibes.",
-            }
-            if mood == "CHROME":
-                eater = top_ram_name or "Something"
-                roast = f"{eater} is eating RAM. Close it, champ."
-            else:
-                roast = roast_default[mood]
-
-            put(y0 + 13, x0 + 2, fit(roast, inner_w))
-            put(y0 + box_h - 2, x0 + 2, fit("Keys: q=quit   r=reset stars", inner_w))
-
-            home_only()
-            frame = col + "\n".join(("".join(row)).ljust(w)[:w] for row in canvas) + "\x1b[0m"
-            sys.stdout.write(frame)
-            sys.stdout.flush()
+            sched.run_due()
 
-            if msvcrt.kbhit():
-                k = msvcrt.getwch()
-                if k in ("q", "Q"):
-                    break
-                if k in ("r", "R"):
-                    stars.reset(w, h, n=min(180, max(70, (w * h) // 90)))
+            idle = st["idle"] = not keys.focused or time.monotonic() - st["face_t"] >= IDLE_AFTER
+            for name in ("sim", "frame"):
+                sched.set_period(name, IDLE_DT if idle else FRAME_DT)
 
-            time.sleep(1 / 60)
+            was_focused = keys.focused
+            k = keys.wait(sched.next_due() - time.monotonic())
+            if k in ("q", "Q"):
+                break
+            if k in ("r", "R"):
+                stars.reset(w, h, n=min(180, max(70, (w * h) // 90)))
+            if k in ("s", "S"):
+                st["show_lag"] = not st["show_lag"]
+            if k or (keys.focused and not was_focused):
+                st["face_t"] = time.monotonic()  # back to full rate right away
+                sched.wake("frame")
 
     finally:
+        sampler.stop()
         try:
-            cpu_reader.close()
-        except Exception:
-            pass
-        try:
-            gpu_reader.close()
+            provider.close()
         except Exception:
             pass
+        keys.close()
         sys.stdout.write("\x1b[0m")
         show_cursor()
         exit_alt()
@@ -748,4 +1680,9 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:2] == ["--bench-render"]:
+        # --bench-render [FRAMES [MAX_BPS]]
+        a = sys.argv[2:]
+        bench_render(frames=int(a[0]) if a else 600, max_bps=int(a[1]) if len(a) > 1 else 0)
+    else:
+        main()